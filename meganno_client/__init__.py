@@ -9,7 +9,10 @@ version = Path(_VERSION_PATH).read_text().strip()
 print("meganno-client: " + version)
 
 from .admin import Admin
+from .async_controller import AsyncController
+from .async_service import AsyncService
 from .authentication import Authentication
 from .controller import Controller
+from .helpers import merge_export
 from .prompt import PromptTemplate
 from .service import Service
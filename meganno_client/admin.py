@@ -2,16 +2,19 @@ import pydash
 
 from meganno_client.authentication import Authentication
 from meganno_client.constants import DNS_NAME
-from meganno_client.helpers import (
-    delete_request,
-    get_request,
-    post_request,
-    put_request,
-)
+from meganno_client.helpers import Transport
 
 
 class Admin:
-    def __init__(self, host=None, project="base", token=None, port=5000, auth=None):
+    def __init__(
+        self,
+        host=None,
+        project="base",
+        token=None,
+        port=5000,
+        auth=None,
+        transport=None,
+    ):
         if pydash.is_empty(project):
             raise Exception("Project cannot be None or empty.")
         if pydash.is_empty(token) and pydash.is_empty(auth):
@@ -21,7 +24,12 @@ class Admin:
         self.port = port
         self.auth: Authentication = auth
         self.host = host
-        response = get_request(path=self.__get_path() + "?url_check=1", timeout=5)
+        if transport is None and auth is not None:
+            transport = auth.transport
+        self.transport: Transport = transport or Transport()
+        response = self.transport.get(
+            path=self.__get_path() + "?url_check=1", timeout=5
+        )
         if response.status_code != 200:
             raise Exception(response.text)
 
@@ -66,7 +74,9 @@ class Admin:
         """
         payload = self.get_base_payload()
         payload.update({"active": active})
-        response = get_request(path=f"{self.__get_path()}/invitations", json=payload)
+        response = self.transport.get(
+            path=f"{self.__get_path()}/invitations", json=payload
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -82,7 +92,7 @@ class Admin:
             default to None
         """
         payload = self.get_base_payload()
-        response = get_request(
+        response = self.transport.get(
             path=f"{self.__get_path()}/invitations/{invitation_code}", json=payload
         )
         if response.status_code == 200:
@@ -100,7 +110,9 @@ class Admin:
         """
         payload = self.get_base_payload()
         payload.update({"id": id})
-        response = put_request(path=f"{self.__get_path()}/invitations", json=payload)
+        response = self.transport.put(
+            path=f"{self.__get_path()}/invitations", json=payload
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -116,7 +128,9 @@ class Admin:
         """
         payload = self.get_base_payload()
         payload.update({"id": id})
-        response = delete_request(path=f"{self.__get_path()}/invitations", json=payload)
+        response = self.transport.delete(
+            path=f"{self.__get_path()}/invitations", json=payload
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -139,7 +153,9 @@ class Admin:
         """
         payload = self.get_base_payload()
         payload.update({"code": code, "role_code": role_code, "single_use": single_use})
-        response = post_request(path=f"{self.__get_path()}/invitations", json=payload)
+        response = self.transport.post(
+            path=f"{self.__get_path()}/invitations", json=payload
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -0,0 +1,107 @@
+class AnnotationStore:
+    """
+    The AnnotationStore class holds the annotation cache of a subset,
+    indexed by record uuid and annotator, so that lookups and updates
+    take constant time instead of a scan of the annotation list.
+
+    Attributes
+    ----------
+    __annotation_list : list
+        Data and annotations for each record, as returned by the backend.
+        See `Subset.value` for the format.
+    __by_uuid : dict
+        Record uuid -> item of `__annotation_list`.
+    __by_annotator : dict
+        Record uuid -> {annotator -> index in the item's `annotation_list`}.
+    """
+
+    def __init__(self, annotation_list=[]):
+        """
+        Init function
+
+        Parameters
+        ----------
+        annotation_list : list
+            Data and annotations for each record, as returned by the backend.
+        """
+        self.__annotation_list = annotation_list
+        self.__by_uuid = {}
+        self.__by_annotator = {}
+        for datapoint in annotation_list:
+            self.__index(datapoint)
+
+    def __index(self, datapoint):
+        uuid = datapoint["uuid"]
+        if uuid in self.__by_uuid:
+            return
+        self.__by_uuid[uuid] = datapoint
+        self.__by_annotator[uuid] = {
+            annotation["annotator"]: annotation_idx
+            for annotation_idx, annotation in enumerate(datapoint["annotation_list"])
+        }
+
+    def value(self):
+        """
+        Get the cached annotation list, in subset order.
+        """
+        return self.__annotation_list
+
+    def get(self, uuid):
+        """
+        Get data and annotations of a record, or None if not cached.
+        """
+        return self.__by_uuid.get(uuid)
+
+    def set(self, uuid, annotator, labels):
+        """
+        Set the labels of `annotator` on a cached record.
+
+        Returns
+        -------
+        updated : bool
+            False if the record is not in the cache.
+        """
+        datapoint = self.__by_uuid.get(uuid)
+        if datapoint is None:
+            return False
+        positions = self.__by_annotator[uuid]
+        if annotator in positions:
+            datapoint["annotation_list"][positions[annotator]] = labels
+        else:
+            positions[annotator] = len(datapoint["annotation_list"])
+            datapoint["annotation_list"].append(labels)
+        return True
+
+    def select(self, uuid_list):
+        """
+        Build a store holding copies of the entries of `uuid_list`,
+        in that order.
+
+        Returns
+        -------
+        store : AnnotationStore
+            None if any of the records is not cached.
+        """
+        if any(uuid not in self.__by_uuid for uuid in uuid_list):
+            return None
+        return AnnotationStore(
+            [
+                {
+                    **self.__by_uuid[uuid],
+                    "annotation_list": list(self.__by_uuid[uuid]["annotation_list"]),
+                }
+                for uuid in uuid_list
+            ]
+        )
+
+    def merge(self, other):
+        """
+        Build a store with the entries of this store followed by the ones of
+        `other` for records not cached here. Entries are shared, not copied.
+        """
+        merged = AnnotationStore(list(self.__annotation_list))
+        for datapoint in other.__annotation_list:
+            if datapoint["uuid"] not in merged.__by_uuid:
+                merged.__annotation_list.append(datapoint)
+                merged.__index(datapoint)
+        return merged
@@ -0,0 +1,302 @@
+import json
+
+from meganno_client.constants import VALID_PROVIDERS
+from meganno_client.llm_jobs import OpenAIJob
+
+
+class AsyncController:
+    """
+    The AsyncController class is the awaitable counterpart of `Controller`
+    for managing annotation agents and listing their jobs.
+    Running jobs (`Controller.run_job`) stays on the synchronous API.
+    """
+
+    def __init__(self, service):
+        """
+        Init function
+
+        Parameters
+        ----------
+        service : AsyncService
+            MEGAnno async service object for the connected project.
+        """
+        self.__service = service
+
+    async def list_agents(
+        self,
+        created_by_filter=None,
+        provider_filter=None,
+        api_filter=None,
+        show_job_list=False,
+    ):
+        """
+        Get the list of registered agents by their issuer IDs.
+
+        Parameters
+        ----------
+        created_by_filter : list, optional
+            List of user IDs to filter agents, by default None (if None, list all)
+        provider_filter: str
+            Returns agents with the specified provider eg. openai
+        api_filter: list(str)
+            Returns agents with the specified api eg. completion
+        show_job_list: bool
+            if True, also return the list uuids of jobs of the agent.
+
+        Returns
+        -------
+        list
+            A list of agents that are created by specified issuers.
+        """
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {
+                "created_by_filter": created_by_filter,
+                "provider_filter": provider_filter,
+                "api_filter": api_filter,
+                "show_job_list": show_job_list,
+            }
+        )
+        path = self.__service.get_service_endpoint("get_agents")
+        response = await self.__service.transport.get(path, json=payload)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(response.text)
+
+    async def list_jobs(self, filter_by, filter_values, show_agent_details=False):
+        """
+        Get the list of jobs with querying filters.
+
+        Parameters
+        ----------
+        filter_by : str
+            Filter options. Must be ["agent_uuid" | "issued_by" | "uuid"] | None
+        filter_values : list
+            List of uuids of entity specified in 'filter_by'
+        show_agent_details : bool, optional
+            If True, return agent configuration, by default False
+
+        Returns
+        -------
+        list
+            A list of jobs that match given filtering criteria.
+        """
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {
+                "details": show_agent_details,
+                "filter_by": filter_by,
+                "filter_values": filter_values,
+            }
+        )
+        path = self.__service.get_service_endpoint("get_jobs")
+        response = await self.__service.transport.get(path, json=payload)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(response.text)
+
+    async def list_jobs_of_agent(self, agent_uuid, show_agent_details=False):
+        """
+        Get the list of jobs of a given agent.
+
+        Parameters
+        ----------
+        agent_uuid : str
+            Agent uuid
+        show_agent_details : bool, optional
+            If True, return agent configuration, by default False
+
+        Returns
+        -------
+        list
+            A list of jobs of a given agent
+        """
+        payload = await self.__service.get_base_payload()
+        payload.update({"details": show_agent_details})
+        path = self.__service.get_service_endpoint("get_jobs_of_agent").format(
+            agent_uuid=agent_uuid
+        )
+        response = await self.__service.transport.get(path, json=payload)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(response.text)
+
+    async def register_agent(self, model_config, prompt_template_str, provider_api):
+        """
+        Register an agent with backend service.
+
+        Parameters
+        ----------
+        model_config : dict
+            Model configuration object
+        prompt_template_str : str
+            Serialized prompt template
+        provider_api : str
+            Name of provider and corresponding api eg. 'openai:chat'
+
+        Returns
+        -------
+        dict
+            object with unique agent id.
+        """
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {
+                "model_config": model_config,
+                "prompt_template": prompt_template_str,
+                "provider_api": provider_api,
+            }
+        )
+        path = self.__service.get_service_endpoint("register_agent")
+        response = await self.__service.transport.post(path, json=payload)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(response.text)
+
+    async def persist_job(self, agent_uuid, job_uuid, label_name, annotation_uuid_list):
+        """
+        Given annoations for a subset, persist them as a job for the project.
+
+        Parameters
+        ----------
+        agent_uuid : str
+            Agent uuid
+        job_uuid : str
+            Job uuid
+        label_name : str
+            Label name used for annotation
+        annotation_uuid_list : list
+            List of uuids of records that have valid annotations from the job
+
+        Returns
+        -------
+        dict
+            Object with job uuid and annotation count
+        """
+        print("\nPersisting the job :::")
+        print("\nJob ID: {}".format(job_uuid))
+
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {
+                "label_name": label_name,
+                "annotation_uuid_list": annotation_uuid_list,
+            }
+        )
+        path = self.__service.get_service_endpoint("set_job").format(
+            agent_uuid=agent_uuid, job_uuid=job_uuid
+        )
+        response = await self.__service.transport.post(path, json=payload)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(response.text)
+
+    async def create_agent(
+        self, model_config, prompt_template, provider_api="openai:chat"
+    ):
+        """
+        Validate model configs and register a new agent.
+        Return new agent's uuid.
+
+        Parameters
+        ----------
+        model_config : dict
+            Model configuration object
+        prompt_template : str
+            PromptTemplate object
+        provider_api : str
+            Name of provider and corresponding api eg. 'openai:chat'
+
+        Returns
+        -------
+        agent_uuid : str
+            Agent uuid
+        """
+        # validate configs
+        api_provider, api_name = provider_api.split(":")
+        if (
+            api_provider not in VALID_PROVIDERS
+            or api_name not in VALID_PROVIDERS[api_provider]
+        ):
+            raise Exception("LLM not supported")
+        if api_provider == "openai":
+            model_config = OpenAIJob.validate_model_config(model_config, api_name)
+        # calls register_agent (with model_config, template, provider_api to serializer)
+        agent = await self.register_agent(
+            model_config, prompt_template.get_template(), provider_api
+        )  # service endpoint
+        agent_uuid = agent["agent_uuid"]
+
+        print("Agent registered :::")
+        print("\nAgent ID: {}".format(agent_uuid))
+        print("\nModel config: {}".format(model_config))
+        print("\nAPI Provider: {}".format(provider_api))
+        print("\nPrompt template: ")
+        print("\033[34m{}\x1b[0m".format(prompt_template.get_template()))
+        return agent_uuid
+
+    async def get_agent_by_uuid(self, agent_uuid):
+        """
+        Return agent model configuration, prompt template, and creator id of specified agent.
+
+        Parameters
+        ----------
+        agent_uuid : str
+            Agent uuid
+
+        Returns
+        -------
+        dict
+            A dict containing agent details.
+        """
+        agents = await self.list_my_agents()
+        for a in agents:
+            if a["uuid"] == agent_uuid:
+                return {
+                    "agent_uuid": a["uuid"],
+                    "model_config": json.loads(a["model_config"]),
+                    "prompt_template": a["prompt_template"],
+                    "provider_api": a["provider_api"],
+                    "created_by": a["created_by"],
+                }
+        return None
+
+    async def list_my_agents(self):
+        """
+        Get the list of registered agents by me.
+
+        Returns
+        -------
+        agents : list
+            A list of agents that are created by me.
+        """
+        annotator_id = (await self.__service.get_annotator())["user_id"]
+        agents = await self.list_agents([annotator_id])  # service endpoint
+        return agents
+
+    async def list_my_jobs(self, show_agent_details=False):
+        """
+        Get the list of jobs of issued by me.
+
+        Parameters
+        ----------
+        show_agent_details : bool, optional
+            If True, return agent configuration, by default False
+
+        Returns
+        -------
+        jobs : list
+            A list of jobs of issued by me.
+        """
+        filter_by = "issued_by"
+        annotator_id = (await self.__service.get_annotator())["user_id"]
+        filter_values = [annotator_id]
+        jobs = await self.list_jobs(
+            filter_by, filter_values, show_agent_details
+        )  # service endpoint
+        return jobs
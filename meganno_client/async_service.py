@@ -0,0 +1,413 @@
+import asyncio
+from collections import deque
+
+import pydash
+
+from meganno_client.authentication import Authentication
+from meganno_client.async_statistic import AsyncStatistic
+from meganno_client.async_subset import AsyncSubset
+from meganno_client.concurrency import (
+    AdaptiveConcurrency,
+    submit_annotation_list,
+)
+from meganno_client.constants import (
+    DEFAULT_LIST_LIMIT,
+    MAX_SEARCH_PARALLELISM,
+    RECONCILIATION_BATCH_SIZE,
+    RECONCILIATION_MAX_WORKERS,
+    SEARCH_PAGE_SIZE,
+)
+from meganno_client.helpers import (
+    AsyncTransport,
+    get_assignment_uuids,
+    get_export_df,
+    get_response_json,
+    get_search_filter,
+    get_search_windows,
+    get_service_endpoint,
+    get_submission,
+    get_user,
+)
+
+
+class AsyncService:
+    """
+    AsyncService objects are the awaitable counterpart of `Service`.
+    All requests go through one long-lived `AsyncTransport`, so callers
+    running inside an event loop can fan out many concurrent requests
+    without threads or nested event loops.
+
+    Example
+    ----
+    ```python
+    async with AsyncService(project="demo", token=token) as service:
+        subset = await service.search(keyword="delay", limit=10)
+        records = await subset.get_view_record()
+    ```
+    """
+
+    def __init__(
+        self, host=None, project=None, token=None, auth=None, port=5000, transport=None
+    ):
+        """
+        Init function. No request is sent until `connect` is awaited,
+        either explicitly or by entering the `async with` block.
+
+        Parameters
+        -------
+        host : str, optional
+            Host IP address for the back-end service to connect to.
+            If None, connects to a Megagon-hosted service.
+        project : str
+            Project name. The name needs to be unique within the host
+            domain.
+        token : str
+            User's authentication token.
+        auth : Authentication
+            Authentication object.
+            Can be skipped if a valid token is provided.
+        transport : AsyncTransport, optional
+            Pooled async HTTP transport to send requests through.
+            If None, create a new one owned by this service.
+        """
+        if pydash.is_empty(project):
+            raise Exception("Project cannot be None or empty.")
+        if pydash.is_empty(token) and pydash.is_empty(auth):
+            raise Exception("At least 1 authentication method is required.")
+        self.project = project
+        self.token = token
+        self.port = port
+        self.auth: Authentication = auth
+        self.host = host
+        self.user = None
+        self.version = None
+        self.__own_transport = transport is None
+        self.__submission_stats = None
+        self.transport: AsyncTransport = transport or AsyncTransport()
+
+    async def connect(self):
+        """
+        Check that the project url is reachable and retrieve the service version.
+        """
+        response = await self.transport.get(
+            path=self.get_service_endpoint() + "?url_check=1", timeout=5
+        )
+        if response.status_code == 200:
+            self.version = pydash.objects.get(response.json(), "version", None)
+        else:
+            raise Exception(response.text)
+        return self
+
+    async def close(self):
+        """
+        Release pooled connections held by the service.
+        Transports shared with other objects are left open.
+        """
+        if self.__own_transport:
+            await self.transport.close()
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def get_version(self):
+        return self.version
+
+    async def __get_token(self):
+        """
+        Get token. If authentication object is used to initialize
+        the service object, retrieve corresponding user token in a worker
+        thread, so that a blocking token refresh does not stall the event
+        loop.
+        """
+        try:
+            if not pydash.is_empty(self.token):
+                return self.token
+            elif not pydash.is_empty(self.auth):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, self.auth.get_token)
+        except:
+            pass
+        return None
+
+    def get_service_endpoint(self, key=None):
+        """
+        Get REST endpoint for the connected project.
+        See `Service.get_service_endpoint`.
+        """
+        return get_service_endpoint(self.host, self.port, self.project, key)
+
+    async def get_base_payload(self):
+        """
+        Get the base payload for any REST request which includes the authentication token.
+        """
+        return {"token": await self.__get_token()}
+
+    def get_project_info(self):
+        return {"id": self.get_service_endpoint(), "project_name": self.project}
+
+    def get_statistics(self):
+        """
+        Get the awaitable statistics object for the project.
+        """
+        return AsyncStatistic(service=self)
+
+    async def get_users_by_uids(self, uids: list = []):
+        """
+        Get user names by their unique IDs.
+        See `Service.get_users_by_uids`.
+        """
+        if len(uids) > 0:
+            path = self.get_service_endpoint("get_users_by_uids")
+            payload = await self.get_base_payload()
+            payload.update({"uids": uids})
+            return get_response_json(await self.transport.get(path, json=payload))
+        return {}
+
+    async def get_annotator(self):
+        """
+        Get annotator's own name and user ID.
+        See `Service.get_annotator`.
+        """
+        if pydash.is_empty(self.user):
+            path = self.get_service_endpoint("get_user")
+            payload = await self.get_base_payload()
+            response = await self.transport.post(path, json=payload)
+            self.user = get_user(get_response_json(response))
+        return self.user
+
+    async def search(
+        self,
+        limit=DEFAULT_LIST_LIMIT,
+        skip=0,
+        uuid_list=None,
+        keyword=None,
+        regex=None,
+        record_metadata_condition=None,
+        annotator_list=None,
+        label_condition=None,
+        label_metadata_condition=None,
+        verification_condition=None,
+        parallelism=1,
+    ):
+        """
+        Search the back-end database based on user-provided predicates.
+        See `Service.search` for the description of each predicate
+        and of `parallelism`.
+
+        Returns
+        -------
+        subset : AsyncSubset
+            Subset meeting the search conditions.
+        """
+        if parallelism > 1 and limit is None:
+            limit = max(
+                (await self.get_statistics().get_label_progress())["total"] - skip, 0
+            )
+        windows = get_search_windows(
+            skip, limit, min(parallelism, MAX_SEARCH_PARALLELISM)
+        )
+        conditions = dict(
+            uuid_list=uuid_list,
+            keyword=keyword,
+            regex=regex,
+            record_metadata_condition=record_metadata_condition,
+            annotator_list=annotator_list,
+            label_condition=label_condition,
+            label_metadata_condition=label_metadata_condition,
+            verification_condition=verification_condition,
+        )
+        results = await asyncio.gather(
+            *[
+                self.__search_uuids(
+                    get_search_filter(
+                        limit=window_limit, skip=window_skip, **conditions
+                    )
+                )
+                for window_skip, window_limit in windows
+            ]
+        )
+        data_uuids = [uuid for result in results for uuid in result]
+        return AsyncSubset(data_uuids=data_uuids, service=self)
+
+    async def __search_uuids(self, filter):
+        payload = await self.get_base_payload()
+        payload.update(filter)
+        path = self.get_service_endpoint("search")
+        return get_response_json(await self.transport.get(path, json=payload))
+
+    async def search_by_job(self, job_id=None, **kwargs):
+        """
+        Search annotations made by an agent job.
+        See `Service.search_by_job`.
+        """
+        ret = await self.search(annotator_list=[job_id], **kwargs)
+        return AsyncSubset(data_uuids=ret.get_uuid_list(), service=self, job_id=job_id)
+
+    async def iter_search(
+        self,
+        page_size=SEARCH_PAGE_SIZE,
+        skip=0,
+        limit=None,
+        by_record=False,
+        prefetch=True,
+        **conditions,
+    ):
+        """
+        Stream search results page by page, prefetching the next page
+        while the current one is consumed.
+        See `Service.iter_search`.
+
+        Example
+        ----
+        ```python
+        async for page in service.iter_search(page_size=1000, keyword="delay"):
+            records = await page.get_view_record()
+        ```
+        """
+        if page_size <= 0:
+            raise Exception("page_size must be a positive integer.")
+
+        async def fetch(offset):
+            size = page_size if limit is None else min(page_size, skip + limit - offset)
+            if size <= 0:
+                return []
+            return await self.__search_uuids(
+                get_search_filter(limit=size, skip=offset, **conditions)
+            )
+
+        offset = skip
+        task = asyncio.ensure_future(fetch(offset)) if prefetch else None
+        try:
+            while True:
+                data_uuids = await task if prefetch else await fetch(offset)
+                offset += len(data_uuids)
+                exhausted = len(data_uuids) < page_size or (
+                    limit is not None and offset >= skip + limit
+                )
+                if prefetch and not exhausted:
+                    task = asyncio.ensure_future(fetch(offset))
+                if len(data_uuids) > 0:
+                    if by_record:
+                        for uuid in data_uuids:
+                            yield uuid
+                    else:
+                        yield AsyncSubset(data_uuids=data_uuids, service=self)
+                if exhausted:
+                    break
+        finally:
+            if task is not None and not task.done():
+                task.cancel()
+
+    async def submit_annotations(self, subset=None, uuid_list=[]):
+        """
+        Submit annotations for a batch of records in a subset to the back-end service database.
+        See `Service.submit_annotations`.
+        """
+        if pydash.is_empty(subset):
+            raise Exception("Subset can not be None.")
+        annotator_user_id = (await self.get_annotator())["user_id"]
+        annotation_list = []
+        for uuid in uuid_list:
+            annotation_data = await subset.get_annotation_by_uuid(uuid)
+            if annotation_data is not None:
+                annotation_list.append(
+                    get_submission(uuid, annotation_data, annotator_user_id)
+                )
+        path = self.get_service_endpoint("submit_annotations_batch")
+        controller = AdaptiveConcurrency()
+        ret = await submit_annotation_list(
+            self.transport,
+            path,
+            await self.get_base_payload(),
+            annotation_list,
+            controller,
+        )
+        self.__submission_stats = controller.get_stats()
+        failed = {r["uuid"] for r in ret if "error" in r}
+        subset.mark_clean([uuid for uuid in uuid_list if uuid not in failed])
+        return ret
+
+    def get_submission_stats(self):
+        """
+        Get statistics of the last `submit_annotations` call.
+        See `Service.get_submission_stats`.
+        """
+        return self.__submission_stats
+
+    async def get_reconciliation_data(self, uuid_list=[]):
+        """
+        Get reconciliation data for the given records.
+        See `Subset.get_reconciliation_data`.
+        """
+        return [
+            item async for item in self.iter_reconciliation_data(uuid_list=uuid_list)
+        ]
+
+    async def iter_reconciliation_data(
+        self, uuid_list=[], max_workers=RECONCILIATION_MAX_WORKERS, by_batch=False
+    ):
+        """
+        Stream reconciliation data for the given records, in `uuid_list` order.
+        See `Service.iter_reconciliation_data`.
+
+        Example
+        ----
+        ```python
+        async for batch in service.iter_reconciliation_data(uuids, by_batch=True):
+            render(batch)
+        ```
+        """
+        if pydash.is_empty(uuid_list):
+            return
+        path = self.get_service_endpoint("get_reconciliation_data")
+
+        async def fetch(uuids):
+            payload = await self.get_base_payload()
+            payload.update({"uuid_list": uuids})
+            response = await self.transport.get(path, json=payload)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                raise Exception(response.text)
+
+        tasks = deque()
+        index = 0
+        try:
+            while index < len(uuid_list) or tasks:
+                while index < len(uuid_list) and len(tasks) < max_workers:
+                    uuids = uuid_list[index : index + RECONCILIATION_BATCH_SIZE]
+                    index += len(uuids)
+                    tasks.append(asyncio.ensure_future(fetch(uuids)))
+                result = await tasks.popleft()
+                if by_batch:
+                    yield result
+                else:
+                    for item in result:
+                        yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def export(self):
+        """
+        Exporting function.
+        See `Service.export`.
+        """
+        payload = await self.get_base_payload()
+        path = self.get_service_endpoint("export_data")
+        return get_export_df(await self.transport.get(path, json=payload))
+
+    async def get_assignment(self, annotator=None, latest_only=False):
+        """
+        Get workload assignment for annotator.
+        See `Service.get_assignment`.
+        """
+        payload = await self.get_base_payload()
+        payload["annotator"] = annotator
+        payload["latest_only"] = latest_only
+        path = self.get_service_endpoint("get_assignment")
+        response = await self.transport.get(path, json=payload)
+        return AsyncSubset(data_uuids=get_assignment_uuids(response), service=self)
@@ -0,0 +1,315 @@
+import json
+
+import pydash
+
+from meganno_client.annotation_store import AnnotationStore
+from meganno_client.codec import decode_value
+from meganno_client.helpers import (
+    check_annotation_input,
+    get_response_json,
+    get_uuid_payload,
+)
+from meganno_client.uuid_array import UUIDArray
+
+
+class AsyncSubset:
+    """
+    The AsyncSubset class is the awaitable counterpart of `Subset`,
+    returned by `AsyncService` queries.
+
+    Attributes
+    ----------
+    __data_uuids : UUIDArray
+        Unique identifiers of data records in the subset, packed as 128-bit
+        values.
+    __service : AsyncService
+        Connected backend service
+    __my_annotations : AnnotationStore
+        Local cache of the record and annotation view of the subset owned by
+        the annotator, indexed by uuid and annotator. Loaded on first use.
+    __dirty_uuids : dict
+        Uuids of records changed by `set_annotations` since the last
+        confirmed submission.
+    """
+
+    def __init__(self, service, data_uuids=[], job_id=None):
+        """
+        Init function
+
+        Parameters
+        -------
+        service : AsyncService
+            AsyncService-class object identifying the connected
+            backend service and corresponding data storage
+        data_uuids : list
+            List of data uuid's to be included in the subset
+        """
+        self.__data_uuids = UUIDArray(data_uuids)
+        self.__service = service
+        self.job_id = job_id
+        self.annotator_id = job_id
+        self.__my_annotations = None
+        self.__dirty_uuids = {}
+
+    async def __get_annotator_id(self):
+        if self.annotator_id is None:
+            self.annotator_id = (await self.__service.get_annotator())["user_id"]
+        return self.annotator_id
+
+    def get_uuid_list(self):
+        """
+        Get list of unique identifiers for all records in the subset.
+        """
+        return self.__data_uuids.tolist()
+
+    async def prefetch(self):
+        """
+        Eagerly load the annotation cache of the subset.
+        See `Subset.prefetch`.
+        """
+        await self.value()
+        return self
+
+    async def __get_annotation_list(self, annotator_list: list = None):
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {"uuid_list": self.get_uuid_list(), "annotator_list": annotator_list}
+        )
+        path = self.__service.get_service_endpoint("get_annotations")
+        return get_response_json(await self.__service.transport.get(path, json=payload))
+
+    async def value(self, annotator_list: list = None):
+        """
+        Check for cached data and annotations of service owner,
+        or retrieve for other annotators (not cached).
+        See `Subset.value`.
+        """
+        if annotator_list is None:
+            if self.__my_annotations is None:
+                self.__my_annotations = AnnotationStore(
+                    await self.__get_annotation_list(
+                        annotator_list=[await self.__get_annotator_id()]
+                    )
+                )
+            return self.__my_annotations.value()
+        else:
+            return await self.__get_annotation_list(annotator_list=annotator_list)
+
+    async def get_view_record(
+        self,
+        record_id=None,
+        record_content=None,
+        record_meta_names=None,
+        as_numpy=False,
+    ):
+        payload = get_uuid_payload(
+            await self.__service.get_base_payload(),
+            self.get_uuid_list(),
+            record_id=record_id,
+            record_content=record_content,
+            record_meta_names=record_meta_names or None,
+        )
+        path = self.__service.get_service_endpoint("get_view_record")
+        records = get_response_json(
+            await self.__service.transport.get(path, json=payload)
+        )
+        if record_meta_names:
+            # vectors stored with `set_metadata(vector_encoding=...)`
+            return decode_value(records, as_numpy=as_numpy)
+        return records
+
+    async def get_view_annotation(
+        self,
+        annotator_list=None,
+        label_names=None,
+        label_meta_names=None,
+    ):
+        payload = get_uuid_payload(
+            await self.__service.get_base_payload(),
+            self.get_uuid_list(),
+            annotator_list=annotator_list,
+            label_names=label_names,
+            label_meta_names=label_meta_names,
+        )
+        path = self.__service.get_service_endpoint("get_view_annotation")
+        return get_response_json(await self.__service.transport.get(path, json=payload))
+
+    async def get_view_verification(
+        self,
+        label_name=None,
+        label_level=None,
+        annotator=None,
+        verifier_filter=None,
+        status_filter=None,
+    ):
+        payload = get_uuid_payload(
+            await self.__service.get_base_payload(),
+            self.get_uuid_list(),
+            label_name=label_name,
+            label_level=label_level,
+            annotator=annotator,
+            verifier_filter=verifier_filter,
+            status_filter=status_filter,
+        )
+        path = self.__service.get_service_endpoint("get_view_verification")
+        return get_response_json(await self.__service.transport.get(path, json=payload))
+
+    async def get_annotation_by_uuid(self, uuid):
+        """
+        Return the annotation for a particular data record (specified by uuid)
+        See `Subset.get_annotation_by_uuid`.
+        """
+        await self.prefetch()
+        return self.__my_annotations.get(uuid)
+
+    async def set_annotations(self, uuid=None, labels=None):
+        """
+        Set the annotation for a particular data record with the specified label
+        See `Subset.set_annotations`.
+        """
+        check_annotation_input(uuid, labels)
+        annotator_user_id = await self.__get_annotator_id()
+        labels["annotator"] = annotator_user_id
+        await self.prefetch()
+        if self.__my_annotations.set(uuid, annotator_user_id, labels):
+            self.__dirty_uuids[uuid] = True
+        return labels
+
+    async def set_annotations_many(self, annotations):
+        """
+        Set the annotations of many data records at once.
+        See `Subset.set_annotations_many`.
+        """
+        if isinstance(annotations, dict):
+            annotations = annotations.items()
+        return [
+            await self.set_annotations(uuid, labels) for uuid, labels in annotations
+        ]
+
+    def get_dirty_uuids(self):
+        """
+        Get uuids of records changed and not yet confirmed by the backend.
+        See `Subset.get_dirty_uuids`.
+        """
+        return list(self.__dirty_uuids)
+
+    def mark_clean(self, uuid_list):
+        """
+        Mark records as in sync with the backend.
+        See `Subset.mark_clean`.
+        """
+        for uuid in uuid_list:
+            self.__dirty_uuids.pop(uuid, None)
+
+    async def submit_changes(self):
+        """
+        Submit only the records modified since the last confirmed submission.
+        See `Subset.submit_changes`.
+        """
+        if len(self.__dirty_uuids) == 0:
+            return []
+        return await self.__service.submit_annotations(self, self.get_dirty_uuids())
+
+    async def get_reconciliation_data(self, uuid_list=None):
+        """
+        Return the list of reconciliation data for all data entries specified by user.
+        See `Subset.get_reconciliation_data`.
+        """
+        if uuid_list is None:
+            uuid_list = self.get_uuid_list()
+        return await self.__service.get_reconciliation_data(uuid_list=uuid_list)
+
+    def iter_reconciliation_data(self, uuid_list=None, by_batch=False):
+        """
+        Stream the reconciliation data of the subset records, as an async generator.
+        See `Subset.iter_reconciliation_data`.
+        """
+        if uuid_list is None:
+            uuid_list = self.get_uuid_list()
+        return self.__service.iter_reconciliation_data(
+            uuid_list=uuid_list, by_batch=by_batch
+        )
+
+    async def suggest_similar(self, record_meta_name, limit=3):
+        """
+        Suggest similar data records based on metadata distance.
+        See `Subset.suggest_similar`.
+        """
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {
+                "uuid_list": self.get_uuid_list(),
+                "record_meta_name": record_meta_name,
+                "limit": limit,
+            }
+        )
+        path = self.__service.get_service_endpoint("suggest_similar_annotations")
+        response = await self.__service.transport.get(path, json=payload)
+        if response.status_code == 200:
+            suggested_uuids = list(set(json.loads(response.text)))
+            return AsyncSubset(service=self.__service, data_uuids=suggested_uuids)
+        else:
+            raise Exception(response.text)
+
+    async def assign(self, annotator):
+        """
+        Assign the current subset as payload to an annotator.
+        See `Subset.assign`.
+        """
+        if pydash.is_empty(annotator):
+            raise Exception("Annotator cannot be None or empty.")
+        payload = await self.__service.get_base_payload()
+        payload.update(
+            {
+                "subset_uuid_list": self.get_uuid_list(),
+                "annotator": annotator,
+            }
+        )
+        path = self.__service.get_service_endpoint("get_assignment")
+        return get_response_json(
+            await self.__service.transport.post(path, json=payload)
+        )
+
+    def __derive(self, data_uuids, operands):
+        """
+        Create a subset from a set operation, reusing the operands' caches.
+        See `Subset` set operations.
+        """
+        subset = AsyncSubset(service=self.__service, data_uuids=data_uuids)
+        stores = [
+            operand.__my_annotations
+            for operand in operands
+            if operand.job_id is None and operand.__my_annotations is not None
+        ]
+        if len(stores) == 0:
+            return subset
+        store = stores[0]
+        for other in stores[1:]:
+            store = store.merge(other)
+        selected = store.select(data_uuids.tolist())
+        if selected is not None:
+            subset.annotator_id = operands[0].annotator_id
+            subset.__my_annotations = selected
+        return subset
+
+    # overlading subset operation with set algebra
+    def __or__(self, other):
+        data_uuids = self.__data_uuids.union(other.__data_uuids)
+        return self.__derive(data_uuids, [self, other])
+
+    def union(self, other):
+        return AsyncSubset.__or__(self, other)
+
+    def __and__(self, other):
+        data_uuids = self.__data_uuids.intersection(other.__data_uuids)
+        return self.__derive(data_uuids, [self, other])
+
+    def intersection(self, other):
+        return AsyncSubset.__and__(self, other)
+
+    def __sub__(self, other):
+        data_uuids = self.__data_uuids.difference(other.__data_uuids)
+        return self.__derive(data_uuids, [self, other])
+
+    def difference(self, other):
+        return AsyncSubset.__sub__(self, other)
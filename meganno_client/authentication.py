@@ -7,16 +7,17 @@ import time
 import webbrowser
 
 import pydash
-import requests
 import websockets
 from websockets import exceptions as ws_exceptions
 
 from meganno_client.constants import DNS_NAME
-from meganno_client.helpers import get_request, post_request
+from meganno_client.helpers import Transport
 
 
 class Authentication:
-    def __init__(self, host=None, project="base", token=None, port=5000):
+    def __init__(
+        self, host=None, project="base", token=None, port=5000, transport=None
+    ):
         if not pydash.is_empty(host) and pydash.is_empty(project):
             raise Exception("Project cannot be None or empty.")
         self.host = host
@@ -25,11 +26,14 @@ class Authentication:
         self.process = None
         self.port = port
         self.stop = None
+        self.transport: Transport = transport or Transport()
         if pydash.is_empty(host):
             self.project = "base"
         if not pydash.is_empty(project):
             self.project = project
-        response = get_request(path=self.__get_path() + "?url_check=1", timeout=5)
+        response = self.transport.get(
+            path=self.__get_path() + "?url_check=1", timeout=5
+        )
         if response.status_code != 200:
             raise Exception(response.text)
         self.__WEB_PORT = 52235
@@ -38,7 +42,7 @@ class Authentication:
             self.__start_servers()
 
     def __signin(self, username, password):
-        return post_request(
+        return self.transport.post(
             path=f"{self.__get_path()}/users/signin",
             json={
                 "username": username,
@@ -89,7 +93,7 @@ class Authentication:
                                     json.dumps({"error": response.text})
                                 )
                         elif pydash.is_equal(action, "signup"):
-                            response = post_request(
+                            response = self.transport.post(
                                 path=f"{self.__get_path()}/users/register",
                                 json={
                                     "invitation_code": pydash.objects.get(
@@ -165,7 +169,7 @@ class Authentication:
             if true, return job tokens only
         """
         payload = {"token": self.token, "job": job}
-        response = get_request(f"{self.__get_path()}/tokens", json=payload)
+        response = self.transport.get(f"{self.__get_path()}/tokens", json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -191,7 +195,7 @@ class Authentication:
             "expiration_duration": expiration_duration,
             "job": job,
         }
-        response = requests.post(f"{self.__get_path()}/tokens", json=payload)
+        response = self.transport.post(f"{self.__get_path()}/tokens", json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -207,7 +211,7 @@ class Authentication:
         """
         payload = {"token": self.token}
         payload.update({"ids": ids})
-        response = requests.delete(f"{self.__get_path()}/tokens", json=payload)
+        response = self.transport.delete(f"{self.__get_path()}/tokens", json=payload)
         if response.status_code == 200:
             return response.json()
         else:
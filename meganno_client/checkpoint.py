@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+
+
+class MetadataCheckpoint:
+    """
+    The MetadataCheckpoint class records which records `Service.set_metadata`
+    has already processed, with a hash of the content each value was computed
+    from, so that an interrupted or repeated run only recomputes records that
+    are new or whose content changed.
+
+    State is kept in an append-only JSON-lines file, one line per uploaded
+    batch; a line cut short by a crash is ignored on load.
+
+    Attributes
+    ----------
+    __path : str
+        Location of the state file.
+    __meta_name : str
+        Name of the metadata the state belongs to.
+    __hashes : dict
+        Record uuid -> content hash of the last uploaded value.
+    __torn : bool
+        Whether the state file ends with an incomplete line.
+    """
+
+    def __init__(self, path, meta_name):
+        """
+        Init function
+
+        Parameters
+        ----------
+        path : str
+            Location of the state file. Created if it does not exist.
+        meta_name : str
+            Name of the metadata being set. Lines written for another
+            metadata name are ignored.
+        """
+        self.__path = path
+        self.__meta_name = meta_name
+        self.__hashes = {}
+        self.__torn = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    self.__torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("meta_name") == meta_name:
+                        self.__hashes.update(entry["hashes"])
+
+    @staticmethod
+    def content_hash(content):
+        """
+        Hash of a record content, stable across runs.
+        """
+        text = json.dumps(content, sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_uuid_list(self):
+        """
+        Get uuids of the records already processed.
+        """
+        return list(self.__hashes)
+
+    def get_hash(self, uuid):
+        """
+        Get the content hash recorded for a record, or None.
+        """
+        return self.__hashes.get(uuid)
+
+    def is_done(self, uuid, content_hash):
+        """
+        Whether the record was processed with the same content.
+        """
+        return self.__hashes.get(uuid) == content_hash
+
+    def record(self, hashes):
+        """
+        Append a processed batch to the state file and flush it to disk.
+
+        Parameters
+        ----------
+        hashes : dict
+            Record uuid -> content hash, for the records of the batch.
+        """
+        if len(hashes) == 0:
+            return
+        line = json.dumps({"meta_name": self.__meta_name, "hashes": hashes})
+        with open(self.__path, "a", encoding="utf-8") as file:
+            if self.__torn:
+                # start after the partial line of an interrupted write
+                file.write("\n")
+                self.__torn = False
+            file.write(line + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.__hashes.update(hashes)
+
+
+# name the lines of import state files are written under
+IMPORT_CHECKPOINT_NAME = "__import__"
+
+
+class ImportCheckpoint(MetadataCheckpoint):
+    """
+    The ImportCheckpoint class records the id and content hash (see
+    `helpers.get_record_hashes`, as hex) of the records already in the
+    project, read by `Service.import_data_df(dedup=True)`. Records never
+    change after import, so a resumed import only reads the records added
+    since the previous run. Same file format as MetadataCheckpoint.
+    """
+
+    def __init__(self, path):
+        """
+        Init function
+
+        Parameters
+        ----------
+        path : str
+            Location of the state file. Created if it does not exist.
+        """
+        super().__init__(path, IMPORT_CHECKPOINT_NAME)
@@ -0,0 +1,101 @@
+import base64
+import numbers
+
+import numpy as np
+
+VECTOR_DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+
+def is_vector(value):
+    """
+    Whether `value` is a numeric vector: a NumPy array of numbers or a
+    non-empty list/tuple of numbers.
+    """
+    if isinstance(value, np.ndarray):
+        return value.dtype.kind in "iuf"
+    return (
+        isinstance(value, (list, tuple))
+        and len(value) > 0
+        and all(
+            isinstance(x, numbers.Number) and not isinstance(x, bool) for x in value
+        )
+    )
+
+
+def is_encoded_vector(value):
+    """
+    Whether `value` was produced by `encode_vector`.
+    """
+    return isinstance(value, dict) and value.keys() == {"dtype", "shape", "base64"}
+
+
+def encode_vector(vector, dtype="float32"):
+    """
+    Pack a vector as a base64 string of little-endian floats.
+
+    Parameters
+    ----------
+    vector : list | numpy.ndarray
+        Numeric vector (or array of any shape).
+    dtype : str
+        "float32" or "float16".
+
+    Returns
+    -------
+    encoded : dict
+        `{"dtype": dtype, "shape": [...], "base64": str}`
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise Exception(f"Vector encoding must be one of {list(VECTOR_DTYPES)}.")
+    array = np.asarray(vector, dtype=VECTOR_DTYPES[dtype])
+    return {
+        "dtype": dtype,
+        "shape": list(array.shape),
+        "base64": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def decode_vector(encoded):
+    """
+    Unpack the output of `encode_vector` into a NumPy array.
+    """
+    buffer = base64.b64decode(encoded["base64"])
+    array = np.frombuffer(buffer, dtype=VECTOR_DTYPES[encoded["dtype"]])
+    return array.reshape(encoded["shape"])
+
+
+def encode_value(value, vector_encoding=None):
+    """
+    Make a metadata value JSON-serializable: NumPy scalars become Python
+    numbers, also inside lists, tuples and dicts, and vectors are packed with
+    `encode_vector` if `vector_encoding` is set, or converted to lists
+    otherwise.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if vector_encoding is not None and is_vector(value):
+        return encode_vector(value, dtype=vector_encoding)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    return value
+
+
+def decode_value(value, as_numpy=False):
+    """
+    Inverse of `encode_value`: unpack the encoded vectors found anywhere in
+    `value` (nested in dicts and lists, e.g. a `get_view_record` response),
+    as NumPy arrays if `as_numpy` is True or as lists otherwise.
+    Other values are returned unchanged.
+    """
+    if is_encoded_vector(value):
+        array = decode_vector(value)
+        return array if as_numpy else array.tolist()
+    if isinstance(value, dict):
+        return {key: decode_value(item, as_numpy) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_value(item, as_numpy) for item in value]
+    return value
@@ -0,0 +1,329 @@
+import asyncio
+import random
+import time
+import uuid
+
+import httpx
+
+from meganno_client.constants import (
+    BATCH_SIZE,
+    BISECT_STATUS_CODES,
+    OVERLOAD_STATUS_CODES,
+    RETRY_BACKOFF_SECONDS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_MAX_BACKOFF_SECONDS,
+    SUBMIT_MAX_BATCH_SIZE,
+    SUBMIT_MAX_CONCURRENCY,
+    SUBMIT_TARGET_LATENCY_SECONDS,
+)
+
+
+class AdaptiveConcurrency:
+    """
+    The AdaptiveConcurrency class adjusts the batch size and the number of
+    in-flight requests of a batched upload with an AIMD policy: both grow
+    additively while the backend answers within the target latency, the
+    batch size is halved when responses get slow, and both are halved on
+    429/5xx responses or timeouts.
+
+    Attributes
+    ----------
+    batch_size : int
+        Number of records to put in the next batch.
+    concurrency : int
+        Number of batches allowed in flight.
+    """
+
+    def __init__(
+        self,
+        batch_size=BATCH_SIZE,
+        concurrency=2,
+        max_batch_size=SUBMIT_MAX_BATCH_SIZE,
+        max_concurrency=SUBMIT_MAX_CONCURRENCY,
+        target_latency=SUBMIT_TARGET_LATENCY_SECONDS,
+    ):
+        """
+        Init function
+
+        Parameters
+        ----------
+        batch_size : int
+            Initial batch size, also used as the additive increase step.
+        concurrency : int
+            Initial number of batches in flight.
+        max_batch_size : int
+            Upper bound of the batch size.
+        max_concurrency : int
+            Upper bound of the number of batches in flight.
+        target_latency : float
+            Response time in seconds above which the batch size is reduced.
+        """
+        self.__step = max(1, batch_size)
+        self.__batch_size = float(min(batch_size, max_batch_size))
+        self.__concurrency = float(min(concurrency, max_concurrency))
+        self.__max_batch_size = max_batch_size
+        self.__max_concurrency = max_concurrency
+        self.__target_latency = target_latency
+        self.__start = None
+        self.__requests = 0
+        self.__records = 0
+        self.__overloads = 0
+        self.__peak_concurrency = self.concurrency
+        self.__peak_batch_size = self.batch_size
+
+    @property
+    def batch_size(self):
+        return max(1, int(self.__batch_size))
+
+    @property
+    def concurrency(self):
+        return max(1, int(self.__concurrency))
+
+    def start(self):
+        """
+        Start the clock used to compute throughput.
+        """
+        self.__start = time.monotonic()
+
+    def on_response(self, status_code, latency, records):
+        """
+        Update the limits from the outcome of one batch request.
+
+        Parameters
+        ----------
+        status_code : int
+            HTTP status of the response; 408 for timeouts, None if the request
+            failed without a response.
+        latency : float
+            Seconds between sending the request and receiving the response.
+        records : int
+            Number of records in the batch.
+        """
+        self.__requests += 1
+        if status_code in OVERLOAD_STATUS_CODES:
+            self.__overloads += 1
+            self.__batch_size = max(1.0, self.__batch_size / 2)
+            self.__concurrency = max(1.0, self.__concurrency / 2)
+        elif status_code == 200:
+            self.__records += records
+            if latency > self.__target_latency:
+                self.__batch_size = max(1.0, self.__batch_size / 2)
+            else:
+                self.__batch_size = min(
+                    float(self.__max_batch_size), self.__batch_size + self.__step
+                )
+                # +1 in-flight request per round trip of the current window
+                self.__concurrency = min(
+                    float(self.__max_concurrency),
+                    self.__concurrency + 1 / self.__concurrency,
+                )
+        self.__peak_concurrency = max(self.__peak_concurrency, self.concurrency)
+        self.__peak_batch_size = max(self.__peak_batch_size, self.batch_size)
+
+    def get_stats(self):
+        """
+        Get a summary of the run.
+
+        Returns
+        -------
+        stats : dict
+            `records` confirmed, `requests` sent, `overloads` seen,
+            `seconds` elapsed, `throughput` in records per second, and the
+            final and peak `batch_size` and `concurrency`.
+        """
+        seconds = 0.0 if self.__start is None else time.monotonic() - self.__start
+        return {
+            "records": self.__records,
+            "requests": self.__requests,
+            "overloads": self.__overloads,
+            "seconds": seconds,
+            "throughput": self.__records / seconds if seconds > 0 else 0.0,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "peak_batch_size": self.__peak_batch_size,
+            "peak_concurrency": self.__peak_concurrency,
+        }
+
+
+def get_backoff_seconds(attempt):
+    """
+    Exponential backoff with full jitter: a random delay in
+    `[0, RETRY_BACKOFF_SECONDS * 2 ** attempt]`, capped at
+    `RETRY_MAX_BACKOFF_SECONDS`.
+    """
+    return random.uniform(
+        0, min(RETRY_MAX_BACKOFF_SECONDS, RETRY_BACKOFF_SECONDS * 2**attempt)
+    )
+
+
+async def run_adaptive_batches(
+    items, send_batch, controller, max_retries=RETRY_MAX_ATTEMPTS, bisect=False
+):
+    """
+    Send `items` in batches whose size and concurrency follow `controller`.
+
+    A batch that fails with a 408/429/5xx response or without a response is
+    re-sent with the same idempotency key after a jittered backoff, up to
+    `max_retries` times. With `bisect`, a batch rejected as invalid
+    (400/422) is split in halves that are re-sent one after the other, so
+    that only the offending items end up reported as failed; any other
+    status (e.g. 401/403/404) applies to every batch, so the run stops and
+    raises instead.
+
+    Parameters
+    ----------
+    items : list
+        Items to send, e.g. record uuids.
+    send_batch : coroutine function
+        Called with a list of items and an idempotency key (str); returns
+        `(status_code, results)` where `results` is a list of per-item
+        results, with an `error` field if the batch failed. `status_code`
+        is None if no response was received.
+    controller : AdaptiveConcurrency
+        Controller updated after every response.
+    max_retries : int
+        Maximum number of retries of a batch after overload responses.
+    bisect : bool
+        If True, split rejected batches to isolate the failing items.
+
+    Raises
+    ------
+    Exception
+        With `bisect`, if a batch fails with a status that is neither
+        retryable nor 400/422.
+
+    Returns
+    -------
+    results : list
+        Concatenated results, in the order of `items`.
+    """
+
+    async def process(batch):
+        key = str(uuid.uuid4())
+        for attempt in range(max_retries + 1):
+            sent = time.monotonic()
+            status_code, results = await send_batch(batch, key)
+            controller.on_response(status_code, time.monotonic() - sent, len(batch))
+            if status_code == 200:
+                return results
+            retryable = status_code is None or status_code in OVERLOAD_STATUS_CODES
+            if not retryable or attempt == max_retries:
+                break
+            await asyncio.sleep(get_backoff_seconds(attempt))
+        if bisect and not retryable:
+            if status_code not in BISECT_STATUS_CODES:
+                raise Exception(results[0]["error"])
+            if len(batch) > 1:
+                middle = len(batch) // 2
+                return await process(batch[:middle]) + await process(batch[middle:])
+        return results
+
+    controller.start()
+    results = {}
+    pending = {}
+    index = 0
+    try:
+        while index < len(items) or pending:
+            while index < len(items) and len(pending) < controller.concurrency:
+                batch = items[index : index + controller.batch_size]
+                pending[asyncio.ensure_future(process(batch))] = index
+                index += len(batch)
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results[pending.pop(task)] = task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    return [item for start in sorted(results) for item in results[start]]
+
+
+async def submit_annotation_list(
+    transport, path, base_payload, annotation_list, controller
+):
+    """
+    Submit annotations to the batch endpoint through `run_adaptive_batches`,
+    retrying overloaded batches and bisecting invalid ones.
+    Shared by `Service.submit_annotations` and `AsyncService.submit_annotations`.
+
+    Parameters
+    ----------
+    transport : AsyncTransport
+        Transport the batches are posted with.
+    path : str
+        Url of the `submit_annotations_batch` endpoint.
+    base_payload : dict
+        Payload carrying the authentication token.
+    annotation_list : list
+        `{"record_uuid": ..., "labels": ...}` entries to submit.
+    controller : AdaptiveConcurrency
+        Controller of batch size and concurrency.
+
+    Returns
+    -------
+    results : list
+        Per-record results of the backend, or `{"uuid": ..., "error": ...}`
+        for records rejected by the backend or still failing after retries.
+    """
+
+    async def send_batch(batch, key):
+        payload = dict(base_payload)
+        payload.update({"annotation_list": batch})
+        uuids = [annotation["record_uuid"] for annotation in batch]
+        try:
+            response = await transport.post(
+                path, json=payload, headers={"Idempotency-Key": key}
+            )
+        except httpx.TimeoutException:
+            return 408, [
+                {"uuid": uuid, "error": "408 Request Timeout"} for uuid in uuids
+            ]
+        except Exception as e:
+            return None, [{"uuid": uuid, "error": str(e)} for uuid in uuids]
+        if response.status_code == 200:
+            return 200, response.json()
+        return response.status_code, [
+            {"uuid": uuid, "error": response.text} for uuid in uuids
+        ]
+
+    return await run_adaptive_batches(
+        annotation_list, send_batch, controller, bisect=True
+    )
+
+
+async def post_item_list(transport, item_list, controller):
+    """
+    Post items to per-item endpoints through `run_adaptive_batches`, one
+    item per request, for backends without a bulk endpoint.
+
+    Parameters
+    ----------
+    transport : AsyncTransport
+        Transport the items are posted with.
+    item_list : list
+        `(uuid, path, payload)` tuples.
+    controller : AdaptiveConcurrency
+        Controller of the number of requests in flight; its batch size
+        must be 1.
+
+    Returns
+    -------
+    results : list
+        Response of each item, or `{"uuid": ..., "error": ...}` if it failed,
+        in the order of `item_list`.
+    """
+
+    async def send_batch(batch, key):
+        ((uuid, path, payload),) = batch
+        try:
+            response = await transport.post(
+                path, json=payload, headers={"Idempotency-Key": key}
+            )
+        except httpx.TimeoutException:
+            return 408, [{"uuid": uuid, "error": "408 Request Timeout"}]
+        except Exception as e:
+            return None, [{"uuid": uuid, "error": str(e)}]
+        if response.status_code == 200:
+            return 200, [response.json()]
+        return response.status_code, [{"uuid": uuid, "error": response.text}]
+
+    return await run_adaptive_batches(item_list, send_batch, controller)
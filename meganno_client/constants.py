@@ -39,9 +39,38 @@ NO_TIMEOUT_ENDPOINTS = {
     "get": [SERVICE_ENDPOINTS["suggest_similar_annotations"]],
 }
 DEFAULT_LIST_LIMIT = 10
+SEARCH_PAGE_SIZE = 500
+MAX_SEARCH_PARALLELISM = 8
 REQUEST_TIMEOUT_SECONDS = 10
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30
 DNS_NAME = "https://labeler.megagon.ai"
 HTTPX_LIMITS = httpx.Limits(max_connections=(9 + 1))
 VALID_PROVIDERS = {"openai": ["chat"]}
 FUZZY_THRESHOLD = 0.6
 BATCH_SIZE = 6
+SUBMIT_MAX_BATCH_SIZE = 200
+SUBMIT_MAX_CONCURRENCY = 16
+SUBMIT_TARGET_LATENCY_SECONDS = 2.0
+OVERLOAD_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+# statuses caused by some records of a batch, isolated by bisection
+BISECT_STATUS_CODES = (400, 422)
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_MAX_BACKOFF_SECONDS = 8
+# making sure the request URL doesn't exceed the 2048 characters limitation for certain browsers
+RECONCILIATION_BATCH_SIZE = 45
+RECONCILIATION_MAX_WORKERS = 4
+IMPORT_CHUNK_SIZE = 1000
+# chunks uploaded concurrently may be stored out of order
+IMPORT_MAX_IN_FLIGHT = 1
+EXPORT_PAGE_SIZE = 1000
+EXPORT_COLUMNS = ["data_id", "content", "annotator", "label_name", "label_value"]
+REPLICA_PAGE_SIZE = 1000
+REPLICA_MAX_AGE_SECONDS = 3600
+# verification statuses set by the backend, see `Subset.get_verification_annotations`
+VERIFIED_STATUSES = ("CONFIRMS", "CORRECTS")
+RECORD_CACHE_MAX_ITEMS = 50000
+# local state files (export states, replicas) default to ~/.meganno
+STATE_DIRECTORY = ".meganno"
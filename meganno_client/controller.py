@@ -2,7 +2,6 @@ import json
 import os
 
 from meganno_client.constants import VALID_PROVIDERS
-from meganno_client.helpers import get_request, post_request
 from meganno_client.llm_jobs import OpenAIJob
 from meganno_client.prompt import PromptTemplate
 from meganno_client.service import Service
@@ -64,7 +63,7 @@ class Controller:
             }
         )
         path = self.__service.get_service_endpoint("get_agents")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -97,7 +96,7 @@ class Controller:
             }
         )
         path = self.__service.get_service_endpoint("get_jobs")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -124,7 +123,7 @@ class Controller:
         path = self.__service.get_service_endpoint("get_jobs_of_agent").format(
             agent_uuid=agent_uuid
         )
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -157,7 +156,7 @@ class Controller:
             }
         )
         path = self.__service.get_service_endpoint("register_agent")
-        response = post_request(path, json=payload)
+        response = self.__service.transport.post(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -196,7 +195,7 @@ class Controller:
         path = self.__service.get_service_endpoint("set_job").format(
             agent_uuid=agent_uuid, job_uuid=job_uuid
         )
-        response = post_request(path, json=payload)
+        response = self.__service.transport.post(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -404,12 +403,12 @@ class Controller:
             host=self.__service.host,
             port=self.__service.port,
             token=job_token,
+            transport=self.__service.transport,
         )
 
         # set annotations and labels for job
         job_subset = Subset(job_service, subset.get_uuid_list(), job_id=job_uuid)
-        for uuid, annotation in llm_job.annotations:
-            job_subset.set_annotations(uuid, annotation)
+        job_subset.set_annotations_many(llm_job.annotations)
         ret = job_service.submit_annotations(
             job_subset, llm_job.uuids_with_valid_annotations
         )
@@ -0,0 +1,143 @@
+import secrets
+import sqlite3
+from contextlib import closing
+
+
+class ExportState:
+    """
+    The ExportState class keeps, in an SQLite file, the annotation hash of
+    each labeled record as of the last `Service.export(since=...)` call and
+    the generation in which it last changed. Watermarks returned by delta
+    exports are short tokens, `"<state id>.<generation>"`, pointing at a
+    generation of this state; any earlier watermark of the same state stays
+    valid.
+
+    Attributes
+    ----------
+    path : str
+        Location of the SQLite file.
+    __namespace : str
+        Project the hashes belong to, so that projects can share a file.
+    """
+
+    def __init__(self, namespace, path):
+        """
+        Init function
+
+        Parameters
+        ----------
+        namespace : str
+            Project the hashes belong to, e.g. its service endpoint.
+        path : str
+            Location of the SQLite file, created if it does not exist.
+        """
+        self.path = path
+        self.__namespace = namespace
+        with closing(self.__connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS exports (namespace TEXT PRIMARY KEY,"
+                " state_id TEXT, generation INTEGER)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS export_hashes (namespace TEXT,"
+                " uuid TEXT, hash INTEGER, generation INTEGER,"
+                " PRIMARY KEY (namespace, uuid))"
+            )
+
+    def __connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __get_export(self, connection):
+        return connection.execute(
+            "SELECT state_id, generation FROM exports WHERE namespace = ?",
+            (self.__namespace,),
+        ).fetchone()
+
+    def get_generation(self, watermark):
+        """
+        Get the generation a watermark points at.
+
+        Parameters
+        ----------
+        watermark : str
+            Watermark returned by `commit`, or `""` for none.
+
+        Returns
+        -------
+        generation : int
+            -1 for `""`.
+        """
+        if not watermark:
+            return -1
+        with closing(self.__connect()) as connection:
+            export = self.__get_export(connection)
+        state_id, _, generation = watermark.partition(".")
+        if (
+            export is None
+            or state_id != export[0]
+            or not generation.isdigit()
+            or int(generation) > export[1]
+        ):
+            raise Exception(
+                f"Unknown watermark {watermark!r}: it was not returned for this"
+                f" project with the export state at {self.path}. Use since=''"
+                " for a full export."
+            )
+        return int(generation)
+
+    def get_hashes(self):
+        """
+        Get the stored annotation hashes.
+
+        Returns
+        -------
+        hashes : dict
+            Record uuid -> `(hash, generation)`, for the records that were
+            labeled in some export, including those unlabeled since.
+        """
+        with closing(self.__connect()) as connection:
+            rows = connection.execute(
+                "SELECT uuid, hash, generation FROM export_hashes"
+                " WHERE namespace = ?",
+                (self.__namespace,),
+            ).fetchall()
+        return {uuid: (value, generation) for uuid, value, generation in rows}
+
+    def commit(self, hashes):
+        """
+        Store the hashes of the records changed since the last commit, in a
+        new generation.
+
+        Parameters
+        ----------
+        hashes : dict
+            Record uuid -> annotation hash.
+
+        Returns
+        -------
+        watermark : str
+            Token of the current generation, to pass as `since` next time.
+        """
+        with closing(self.__connect()) as connection, connection:
+            export = self.__get_export(connection)
+            if export is None:
+                export = (secrets.token_hex(8), 0)
+                connection.execute(
+                    "INSERT INTO exports VALUES (?, ?, ?)",
+                    (self.__namespace,) + export,
+                )
+            state_id, generation = export
+            if len(hashes) > 0:
+                generation += 1
+                connection.execute(
+                    "UPDATE exports SET generation = ? WHERE namespace = ?",
+                    (generation, self.__namespace),
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO export_hashes VALUES (?, ?, ?, ?)",
+                    [
+                        (self.__namespace, uuid, value, generation)
+                        for uuid, value in hashes.items()
+                    ],
+                )
+        return f"{state_id}.{generation}"
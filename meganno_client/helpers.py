@@ -1,80 +1,652 @@
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3 import Retry
+import ast
+import hashlib
+import json
+import os
 
-from meganno_client.constants import NO_TIMEOUT_ENDPOINTS, REQUEST_TIMEOUT_SECONDS
+import httpx
+import numpy as np
+import pandas as pd
+import pydash
 
+from meganno_client.constants import (
+    DNS_NAME,
+    EXPORT_COLUMNS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    NO_TIMEOUT_ENDPOINTS,
+    REQUEST_TIMEOUT_SECONDS,
+    SERVICE_ENDPOINTS,
+    STATE_DIRECTORY,
+)
 
-def requests_retry_session(
-    retries=0,
-    backoff_factor=0.3,
-    status_forcelist=(500, 502, 504),
-    session=None,
+
+class Transport:
+    """
+    The Transport class holds a pooled HTTP client used for every REST call
+    to the back-end MEGAnno services. Connections are kept alive and reused
+    across requests, so only the first call to a host pays for TCP/TLS setup.
+
+    Attributes
+    ----------
+    __client : httpx.Client
+        Underlying connection-pooling client.
+    """
+
+    def __init__(
+        self,
+        http2=False,
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    ):
+        """
+        Init function
+
+        Parameters
+        ----------
+        http2 : bool
+            If True, negotiate HTTP/2 so that concurrent requests are
+            multiplexed over a single connection.
+            Requires the `h2` package (`pip install meganno_client[http2]`).
+        max_connections : int
+            Maximum number of concurrent connections in the pool.
+        max_keepalive_connections : int
+            Maximum number of idle connections kept alive in the pool.
+        keepalive_expiry : float
+            Seconds an idle connection is kept alive before being closed.
+        """
+        self.__client = httpx.Client(
+            http2=http2,
+            # `requests` followed redirects by default, e.g. http -> https
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    def request(
+        self, method, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None
+    ):
+        for endpoint in NO_TIMEOUT_ENDPOINTS.get(method, []):
+            if path.endswith(endpoint):
+                timeout = None
+                break
+        try:
+            return self.__client.request(
+                method.upper(), path, json=json, timeout=timeout, headers=headers
+            )
+        except httpx.ConnectTimeout as ex:
+            raise Exception(
+                "{}: {}".format(ex.__class__.__name__, "408 Request Timeout")
+            )
+
+    def get(self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None):
+        return self.request(
+            "get", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    def post(self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None):
+        return self.request(
+            "post", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    def put(self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None):
+        return self.request(
+            "put", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    def delete(self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None):
+        return self.request(
+            "delete", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    def close(self):
+        """
+        Close all pooled connections.
+        """
+        self.__client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncTransport:
+    """
+    The AsyncTransport class is the awaitable counterpart of `Transport`,
+    holding one long-lived `httpx.AsyncClient` so that many requests can be
+    in flight at once from a single event loop.
+
+    Attributes
+    ----------
+    __client : httpx.AsyncClient
+        Underlying connection-pooling client.
+    """
+
+    def __init__(
+        self,
+        http2=False,
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    ):
+        """
+        Init function
+
+        Parameters
+        ----------
+        See `Transport`.
+        """
+        self.__client = httpx.AsyncClient(
+            http2=http2,
+            # `requests` followed redirects by default, e.g. http -> https
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    async def request(
+        self, method, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None
+    ):
+        for endpoint in NO_TIMEOUT_ENDPOINTS.get(method, []):
+            if path.endswith(endpoint):
+                timeout = None
+                break
+        try:
+            return await self.__client.request(
+                method.upper(), path, json=json, timeout=timeout, headers=headers
+            )
+        except httpx.ConnectTimeout as ex:
+            raise Exception(
+                "{}: {}".format(ex.__class__.__name__, "408 Request Timeout")
+            )
+
+    async def get(
+        self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None
+    ):
+        return await self.request(
+            "get", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    async def post(
+        self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None
+    ):
+        return await self.request(
+            "post", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    async def put(
+        self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None
+    ):
+        return await self.request(
+            "put", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    async def delete(
+        self, path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, headers=None
+    ):
+        return await self.request(
+            "delete", path=path, json=json, timeout=timeout, headers=headers
+        )
+
+    async def close(self):
+        """
+        Close all pooled connections.
+        """
+        await self.__client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+def get_search_filter(
+    limit=None,
+    skip=0,
+    uuid_list=None,
+    keyword=None,
+    regex=None,
+    record_metadata_condition=None,
+    annotator_list=None,
+    label_condition=None,
+    label_metadata_condition=None,
+    verification_condition=None,
 ):
-    session = session or requests.Session()
-    retry = Retry(
-        total=retries,
-        read=retries,
-        connect=retries,
-        backoff_factor=backoff_factor,
-        status_forcelist=status_forcelist,
+    """
+    Build the filter part of a search payload, leaving out unset predicates.
+    See `Service.search` for the meaning of each parameter.
+    """
+    filter = {
+        "limit": limit,
+        "skip": skip,
+    }
+    if keyword is not None:
+        filter["keyword"] = keyword
+    if uuid_list is not None:
+        filter["uuid_list"] = uuid_list
+    if regex is not None:
+        filter["regex"] = regex
+    if record_metadata_condition is not None:
+        filter["record_metadata_condition"] = record_metadata_condition
+    if annotator_list is not None:
+        filter["annotator_list"] = annotator_list
+    if label_condition is not None:
+        filter["label_condition"] = label_condition
+    if label_metadata_condition is not None:
+        filter["label_metadata_condition"] = label_metadata_condition
+    if verification_condition is not None:
+        filter["verification_condition"] = verification_condition
+    return filter
+
+
+def get_service_endpoint(host, port, project, key=None):
+    """
+    Compose the REST endpoint of a project from the host, the project url
+    and the route of request `key` in `SERVICE_ENDPOINTS`.
+    """
+    dns_name = DNS_NAME
+    if host is not None:
+        dns_name = host
+    return f"{dns_name}:{port}/" + project + SERVICE_ENDPOINTS.get(key, "")
+
+
+def get_state_path(name, namespace):
+    """
+    Default location of a local state file of a project, e.g. its replica,
+    under `~/.meganno`. The file name is keyed by a hash of `namespace`
+    (the project's service endpoint, with host and project), so that
+    projects do not share a file.
+    """
+    key = hashlib.blake2b(namespace.encode("utf-8"), digest_size=8).hexdigest()
+    directory = os.path.join(os.path.expanduser("~"), STATE_DIRECTORY)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}-{key}.sqlite")
+
+
+def get_uuid_payload(payload, uuid_list, **options):
+    """
+    Add `uuid_list` and the set options of a subset view request to a base
+    payload, leaving out the ones that are None.
+    """
+    payload.update({"uuid_list": uuid_list})
+    payload.update({key: value for key, value in options.items() if value is not None})
+    return payload
+
+
+def get_response_json(response):
+    """
+    Parse the body of a successful response.
+
+    Raises
+    ------
+    Exception
+        If response code is not successful
+    """
+    if response.status_code == 200:
+        return response.json()
+    else:
+        raise Exception(response.text)
+
+
+def get_user(parsed_result):
+    """
+    Build the user dict of `Service.get_annotator` from the backend response.
+    """
+    return {
+        "name": parsed_result.get("username"),
+        "user_id": parsed_result.get("user_id"),
+    }
+
+
+def get_submission(uuid, annotation_data, annotator_user_id):
+    """
+    Build the submission item of a record from its cached annotation data,
+    keeping only the labels owned by `annotator_user_id` (empty if none).
+    """
+    own = [
+        annotation
+        for annotation in annotation_data["annotation_list"]
+        if annotation["annotator"] == annotator_user_id
+    ]
+    return {"record_uuid": uuid, "labels": {} if len(own) == 0 else own[0]}
+
+
+def get_export_df(response):
+    """
+    Build the DataFrame of `Service.export` from the backend response.
+    """
+    return pd.DataFrame(get_response_json(response), columns=EXPORT_COLUMNS)
+
+
+def get_assignment_uuids(response):
+    """
+    Get the union of the record uuids of the assignments in a response.
+    """
+    unique_assignments = set({})
+    for res in get_response_json(response):
+        unique_assignments.update(res["uuid_list"])
+    return list(unique_assignments)
+
+
+def check_annotation_input(uuid, labels):
+    """
+    Validate the arguments of `Subset.set_annotations`.
+    """
+    if pydash.is_empty(uuid):
+        raise Exception("UUID can not be None.")
+    elif pydash.is_empty(labels):
+        raise Exception(f"Labels can not be None. For clearing annotations, use {{}}.")
+
+
+def get_record_hashes(ids, contents):
+    """
+    Stable 128-bit hashes of `(id, content)` pairs of data records, used to
+    recognize rows that were already imported.
+
+    Returns
+    -------
+    hashes : numpy.ndarray
+        Array of dtype V16, aligned with `ids`.
+    """
+    digests = b"".join(
+        hashlib.blake2b(
+            json.dumps([str(record_id), str(content)]).encode("utf-8"), digest_size=16
+        ).digest()
+        for record_id, content in zip(ids, contents)
     )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+    return np.frombuffer(digests, dtype="V16")
 
 
-def delete_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS):
-    for endpoint in NO_TIMEOUT_ENDPOINTS.get("get", []):
-        if path.endswith(endpoint):
-            timeout = None
-            break
-    try:
-        return requests_retry_session().delete(path, json=json, timeout=timeout)
-    except requests.ConnectTimeout as ex:
-        raise Exception("{}: {}".format(ex.__class__.__name__, "408 Request Timeout"))
+def get_annotation_hash(annotation_list):
+    """
+    Stable 64-bit hash of the annotations of a record (record and span
+    labels with their metadata), used to detect changed records between
+    syncs and exports. Annotations are sorted by annotator, and those
+    without labels are left out, as for records never annotated.
+    """
+    annotations = sorted(
+        (
+            annotation
+            for annotation in annotation_list
+            if annotation.get("labels_record") or annotation.get("labels_span")
+        ),
+        key=lambda annotation: str(annotation.get("annotator")),
+    )
+    text = json.dumps(annotations, sort_keys=True, default=str)
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
 
 
-def put_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS):
-    for endpoint in NO_TIMEOUT_ENDPOINTS.get("post", []):
-        if path.endswith(endpoint):
-            timeout = None
-            break
-    try:
-        return requests_retry_session().put(path, json=json, timeout=timeout)
-    except requests.ConnectTimeout as ex:
-        raise Exception("{}: {}".format(ex.__class__.__name__, "408 Request Timeout"))
+def get_export_columns(columns=None):
+    """
+    Validate an export column projection, keeping the order of
+    `EXPORT_COLUMNS`. None means all columns.
+    """
+    if columns is None:
+        return list(EXPORT_COLUMNS)
+    unknown = set(columns) - set(EXPORT_COLUMNS)
+    if len(columns) == 0 or unknown:
+        raise Exception(f"columns must be a non-empty subset of {EXPORT_COLUMNS}.")
+    return [column for column in EXPORT_COLUMNS if column in columns]
 
 
-def get_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS):
-    for endpoint in NO_TIMEOUT_ENDPOINTS.get("get", []):
-        if path.endswith(endpoint):
-            timeout = None
-            break
-    try:
-        return requests_retry_session().get(path, json=json, timeout=timeout)
-    except requests.ConnectTimeout as ex:
-        raise Exception("{}: {}".format(ex.__class__.__name__, "408 Request Timeout"))
+def normalize_export(df):
+    """
+    Cast export rows to the types written by `Service.export_to`: `data_id`
+    to str and `label_value` to a list of str (missing values stay None).
+    Lists and NumPy arrays read back from files are accepted.
+    """
+    df = df.copy()
+    if "data_id" in df.columns:
+        df["data_id"] = [
+            None if is_missing(value) else str(value) for value in df["data_id"]
+        ]
+    if "label_value" in df.columns:
+        df["label_value"] = [
+            (
+                None
+                if is_missing(value)
+                else [
+                    str(v)
+                    for v in (
+                        value
+                        if isinstance(value, (list, tuple, np.ndarray))
+                        else [value]
+                    )
+                ]
+            )
+            for value in df["label_value"]
+        ]
+    return df
+
 
+def is_missing(value):
+    """
+    Whether a scalar cell of an export is empty (None or NaN).
+    """
+    return value is None or (isinstance(value, float) and np.isnan(value))
 
-def post_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS):
-    for endpoint in NO_TIMEOUT_ENDPOINTS.get("post", []):
-        if path.endswith(endpoint):
-            timeout = None
-            break
+
+def get_export_schema(columns):
+    """
+    Arrow schema of export files (see `Service.export_to`): `annotator` and
+    `label_name` are dictionary-encoded, `label_value` is a list of str.
+    Requires `pyarrow`.
+    """
     try:
-        return requests_retry_session().post(path, json=json, timeout=timeout)
-    except requests.ConnectTimeout as ex:
-        raise Exception("{}: {}".format(ex.__class__.__name__, "408 Request Timeout"))
+        import pyarrow as pa
+    except ImportError:
+        raise Exception(
+            "Exporting Parquet or Feather files requires pyarrow: pip install meganno_client[parquet]"
+        )
+    category = pa.dictionary(pa.int32(), pa.string())
+    types = {
+        "data_id": pa.string(),
+        "content": pa.string(),
+        "annotator": category,
+        "label_name": category,
+        "label_value": pa.list_(pa.string()),
+    }
+    return pa.schema([(column, types[column]) for column in columns])
+
+
+def get_export_table(df, schema, categories=None):
+    """
+    Convert export rows to an Arrow table of `schema` (see
+    `get_export_schema`), after `normalize_export`.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Export rows, with the columns of `schema`.
+    schema : pyarrow.Schema
+        Schema of the file being written.
+    categories : dict
+        Column -> {value: code} of the dictionary-encoded columns, extended
+        in place. Pass the same dict for all the tables of a file, so that
+        each table's dictionary extends the previous one, as Arrow IPC
+        files require.
+    """
+    import pyarrow as pa
+
+    df = normalize_export(df)
+    categories = {} if categories is None else categories
+    arrays = []
+    for field in schema:
+        values = df[field.name].tolist()
+        if pa.types.is_dictionary(field.type):
+            codes = categories.setdefault(field.name, {})
+            for value in values:
+                if not is_missing(value):
+                    codes.setdefault(value, len(codes))
+            arrays.append(
+                pa.DictionaryArray.from_arrays(
+                    pa.array(
+                        [
+                            None if is_missing(value) else codes[value]
+                            for value in values
+                        ],
+                        field.type.index_type,
+                    ),
+                    pa.array(list(codes), type=field.type.value_type),
+                )
+            )
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
 
 
-def put_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS):
-    for endpoint in NO_TIMEOUT_ENDPOINTS.get("put", []):
-        if path.endswith(endpoint):
-            timeout = None
-            break
+def parse_label_value(text):
+    """
+    Read back a `label_value` written to a CSV file, e.g. `"['pos']"`.
+    """
+    if text == "":
+        return None
     try:
-        return requests_retry_session().put(path, json=json, timeout=timeout)
-    except requests.ConnectTimeout as ex:
-        raise Exception("{}: {}".format(ex.__class__.__name__, "408 Request Timeout"))
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def merge_export(previous, delta):
+    """
+    Apply a delta returned by `Service.export(since=...)` to a previous export.
+
+    Parameters
+    ----------
+    previous : DataFrame | str
+        Previous export, or the path of a Parquet, Feather or CSV file
+        holding it (e.g. written by `Service.export_to`). A file is
+        overwritten with the merged export, with the schema it was written
+        with (or the one of `export_to` for a new file), and created if it
+        does not exist.
+    delta : DataFrame
+        Delta with a `change` column.
+
+    Returns
+    -------
+    merged : DataFrame
+        Rows of `previous` for unchanged records, followed by the upserted
+        rows of `delta`, with `data_id` as str and `label_value` as lists of
+        str (see `normalize_export`).
+    """
+    path = previous if isinstance(previous, str) else None
+    columns = list(delta.columns.drop("change"))
+    schema = None
+    if path is not None:
+        extension = path.rsplit(".", 1)[-1].lower()
+        exists = os.path.exists(path)
+        if extension in ["parquet", "feather"]:
+            schema = get_export_schema(columns)
+        if not exists:
+            previous = pd.DataFrame(columns=columns)
+        elif extension == "parquet":
+            import pyarrow.parquet as pq
+
+            schema = pq.read_schema(path)
+            previous = pd.read_parquet(path)
+        elif extension == "feather":
+            import pyarrow as pa
+
+            with pa.memory_map(path) as source:
+                schema = pa.ipc.open_file(source).schema
+            previous = pd.read_feather(path)
+        else:
+            previous = pd.read_csv(
+                path,
+                dtype={"data_id": str},
+                converters={"label_value": parse_label_value},
+            )
+    previous = normalize_export(previous)
+    delta = normalize_export(delta)
+    changed = set(delta["data_id"])
+    merged = pd.concat(
+        [
+            previous[~previous["data_id"].isin(changed)].astype(object),
+            delta[delta["change"] == "upsert"].drop(columns="change").astype(object),
+        ],
+        ignore_index=True,
+    )
+    if path is not None:
+        if extension == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(get_export_table(merged, schema), path)
+        elif extension == "feather":
+            import pyarrow as pa
+
+            with pa.ipc.new_file(path, schema) as writer:
+                writer.write_table(get_export_table(merged, schema))
+        else:
+            merged.to_csv(path, index=False)
+    return merged
+
+
+def merge_items(item, extra):
+    """
+    Merge the fields of `extra` into `item`, joining nested dicts and lists
+    (e.g. the metadata of a record fetched one name at a time).
+    """
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(item.get(key), dict):
+            item[key] = {**item[key], **value}
+        elif isinstance(value, list) and isinstance(item.get(key), list):
+            item[key] = item[key] + value
+        else:
+            item[key] = value
+    return item
+
+
+def get_search_windows(skip, limit, parallelism):
+    """
+    Split the search range `[skip, skip + limit)` into at most `parallelism`
+    contiguous `(skip, limit)` windows, in importing order.
+    """
+    if limit is None or limit <= 0 or parallelism <= 1:
+        return [(skip, limit)]
+    window_size = -(-limit // parallelism)
+    return [
+        (start, min(window_size, skip + limit - start))
+        for start in range(skip, skip + limit, window_size)
+    ]
+
+
+_default_transport = None
+
+
+def get_default_transport():
+    """
+    Get the module-level transport shared by the standalone request helpers.
+    """
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = Transport()
+    return _default_transport
+
+
+def delete_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, transport=None):
+    return (transport or get_default_transport()).delete(
+        path, json=json, timeout=timeout
+    )
+
+
+def get_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, transport=None):
+    return (transport or get_default_transport()).get(path, json=json, timeout=timeout)
+
+
+def post_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, transport=None):
+    return (transport or get_default_transport()).post(path, json=json, timeout=timeout)
+
+
+def put_request(path="", json={}, timeout=REQUEST_TIMEOUT_SECONDS, transport=None):
+    return (transport or get_default_transport()).put(path, json=json, timeout=timeout)
@@ -0,0 +1,179 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from meganno_client.constants import DEFAULT_LIST_LIMIT
+from meganno_client.subset import Subset
+
+OPERATORS = {
+    "==": lambda column, value: column == value,
+    "<": lambda column, value: column < value,
+    ">": lambda column, value: column > value,
+    "<=": lambda column, value: column <= value,
+    ">=": lambda column, value: column >= value,
+}
+
+
+def compare(column, operator, value):
+    """
+    Evaluate `column <operator> value` over a Series, as a boolean Series.
+    Values that cannot be compared with `value` (e.g. strings against a
+    number) do not match.
+    """
+    if operator == "exists":
+        return column.notna()
+    if operator not in OPERATORS:
+        raise Exception(f"Unsupported operator: {operator}")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        column = pd.to_numeric(column, errors="coerce")
+        valid = column.notna()
+    else:
+        valid = column.map(type) == type(value)
+    result = pd.Series(False, index=column.index)
+    result[valid] = OPERATORS[operator](column[valid], value)
+    return result
+
+
+class LocalSearch:
+    """
+    The LocalSearch class evaluates the predicates of `Service.search` on
+    local columns of records, metadata, labels and verifications (see
+    `Replica.get_frames`), with vectorized pandas operations and compiled
+    regular expressions, without network calls.
+
+    Attributes
+    ----------
+    __service : Service
+        Service the returned subsets are bound to.
+    __records : DataFrame
+        `uuid`, `content`, one row per record in importing order.
+    __metadata : DataFrame
+        `uuid`, `name`, `value` of record-level metadata.
+    __labels : DataFrame
+        `uuid`, `annotator`, `label_name`, `value`, one row per label value.
+    __label_metadata : DataFrame
+        `uuid`, `annotator`, `label_name`, `name`, `value` of label metadata.
+    __verifications : DataFrame
+        `uuid`, `label_name`, `verified`.
+    """
+
+    def __init__(self, service, frames):
+        """
+        Init function
+
+        Parameters
+        ----------
+        service : Service
+            Service the returned subsets are bound to.
+        frames : dict
+            DataFrames `records`, `metadata`, `labels`, `label_metadata`
+            and `verifications`, as returned by `Replica.get_frames`.
+        """
+        self.__service = service
+        self.__records = frames["records"]
+        self.__metadata = frames["metadata"]
+        self.__labels = frames["labels"]
+        self.__label_metadata = frames["label_metadata"]
+        self.__verifications = frames["verifications"]
+
+    def __get_uuids(self, frame, mask):
+        return frame["uuid"][mask].unique()
+
+    def get_mask(
+        self,
+        uuid_list=None,
+        keyword=None,
+        regex=None,
+        record_metadata_condition=None,
+        annotator_list=None,
+        label_condition=None,
+        label_metadata_condition=None,
+        verification_condition=None,
+    ):
+        """
+        Evaluate the predicates of `Service.search` on every record.
+
+        Returns
+        -------
+        mask : numpy.ndarray
+            Boolean array over the records, in importing order.
+        """
+        records = self.__records
+        uuids = records["uuid"]
+        mask = np.ones(len(records), dtype=bool)
+        if uuid_list is not None:
+            mask &= uuids.isin(uuid_list).to_numpy()
+        if keyword is not None:
+            mask &= records["content"].str.contains(keyword, regex=False, na=False)
+        if regex is not None:
+            mask &= records["content"].str.contains(re.compile(regex), na=False)
+        if record_metadata_condition is not None:
+            condition = record_metadata_condition
+            metadata = self.__metadata[self.__metadata["name"] == condition["name"]]
+            hits = compare(
+                metadata["value"], condition["operator"], condition.get("value")
+            )
+            mask &= uuids.isin(self.__get_uuids(metadata, hits)).to_numpy()
+        labels = self.__labels
+        label_metadata = self.__label_metadata
+        if annotator_list is not None:
+            labels = labels[labels["annotator"].isin(annotator_list)]
+            label_metadata = label_metadata[
+                label_metadata["annotator"].isin(annotator_list)
+            ]
+            mask &= uuids.isin(labels["uuid"].unique()).to_numpy()
+        if label_condition is not None:
+            condition = label_condition
+            labels = labels[labels["label_name"] == condition["name"]]
+            if condition["operator"] == "conflicts":
+                # annotators of a record disagree on the set of values
+                values = labels.groupby(["uuid", "annotator"])["value"].agg(
+                    lambda v: tuple(sorted(map(str, v)))
+                )
+                counts = values.groupby(level="uuid").nunique()
+                hits = counts.index[counts > 1]
+            else:
+                hits = self.__get_uuids(
+                    labels,
+                    compare(
+                        labels["value"], condition["operator"], condition.get("value")
+                    ),
+                )
+            mask &= uuids.isin(hits).to_numpy()
+        if label_metadata_condition is not None:
+            condition = label_metadata_condition
+            label_metadata = label_metadata[
+                (label_metadata["label_name"] == condition["label_name"])
+                & (label_metadata["name"] == condition["name"])
+            ]
+            hits = compare(
+                label_metadata["value"], condition["operator"], condition.get("value")
+            )
+            mask &= uuids.isin(self.__get_uuids(label_metadata, hits)).to_numpy()
+        if verification_condition is not None:
+            condition = verification_condition
+            mode = condition.get("search_mode", "ALL")
+            if mode != "ALL":
+                verifications = self.__verifications
+                verified = self.__get_uuids(
+                    verifications,
+                    (verifications["label_name"] == condition["label_name"])
+                    & verifications["verified"],
+                )
+                hits = uuids.isin(verified).to_numpy()
+                mask &= hits if mode == "VERIFIED" else ~hits
+        return mask
+
+    def search(self, limit=DEFAULT_LIST_LIMIT, skip=0, **conditions):
+        """
+        Search the local records. See `Service.search` for the parameters.
+
+        Returns
+        -------
+        subset : Subset
+            Subset of the matching records, in importing order.
+        """
+        data_uuids = self.__records["uuid"][self.get_mask(**conditions)].tolist()
+        end = None if limit is None else skip + limit
+        return Subset(service=self.__service, data_uuids=data_uuids[skip:end])
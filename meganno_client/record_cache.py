@@ -0,0 +1,154 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing
+
+from meganno_client.constants import RECORD_CACHE_MAX_ITEMS
+
+RECORD_FIELDS = ["record_id", "record_content"]
+
+
+class RecordCache:
+    """
+    The RecordCache class keeps the ids and contents of records, which never
+    change after import, keyed by record uuid: in memory with LRU eviction,
+    and optionally in an SQLite file that several processes on the same host
+    (e.g. notebook kernels) can share.
+
+    Attributes
+    ----------
+    path : str
+        Location of the on-disk tier, or None for memory only.
+    __namespace : str
+        Project the records belong to, so that projects can share a file.
+    __max_items : int
+        Number of records kept in memory.
+    __items : OrderedDict
+        Record uuid -> known fields, least recently used first.
+    __lock : threading.Lock
+        Guards `__items` against concurrent page fetches.
+    """
+
+    def __init__(self, namespace, max_items=RECORD_CACHE_MAX_ITEMS, path=None):
+        """
+        Init function
+
+        Parameters
+        ----------
+        namespace : str
+            Project the records belong to, e.g. its service endpoint.
+        max_items : int
+            Number of records kept in memory.
+        path : str
+            Location of the SQLite file of the on-disk tier, created if it
+            does not exist. None for memory only.
+        """
+        self.path = path
+        self.__namespace = namespace
+        self.__max_items = max_items
+        self.__items = OrderedDict()
+        self.__lock = threading.Lock()
+        if path is not None:
+            with closing(self.__connect()) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS records (namespace TEXT, uuid TEXT,"
+                    " record_id TEXT, record_content TEXT,"
+                    " PRIMARY KEY (namespace, uuid))"
+                )
+
+    def __connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __remember(self, uuid, fields):
+        # called with the lock held
+        item = self.__items.pop(uuid, {})
+        item.update(fields)
+        self.__items[uuid] = item
+        while len(self.__items) > self.__max_items:
+            self.__items.popitem(last=False)
+
+    def get_many(self, uuid_list, fields=RECORD_FIELDS):
+        """
+        Look up records in memory, then on disk.
+
+        Parameters
+        ----------
+        uuid_list : list
+            Uuids of the records.
+        fields : list
+            Fields the records must have: `record_id` and/or `record_content`.
+
+        Returns
+        -------
+        items : dict
+            Record uuid -> `fields`, for the records found with all of them.
+        """
+        found, missing = {}, []
+        with self.__lock:
+            for uuid in uuid_list:
+                item = self.__items.get(uuid)
+                if item is not None and all(field in item for field in fields):
+                    self.__items.move_to_end(uuid)
+                    found[uuid] = {field: item[field] for field in fields}
+                else:
+                    missing.append(uuid)
+        if self.path is None or len(missing) == 0:
+            return found
+        rows = []
+        with closing(self.__connect()) as connection:
+            # stay below SQLite's limit of bound parameters
+            for start in range(0, len(missing), 900):
+                uuids = missing[start : start + 900]
+                rows += connection.execute(
+                    "SELECT uuid, record_id, record_content FROM records"
+                    f" WHERE namespace = ? AND uuid IN ({','.join('?' * len(uuids))})",
+                    [self.__namespace] + uuids,
+                ).fetchall()
+        with self.__lock:
+            for uuid, *values in rows:
+                item = {
+                    field: json.loads(value)
+                    for field, value in zip(RECORD_FIELDS, values)
+                    if value is not None
+                }
+                self.__remember(uuid, item)
+                if all(field in item for field in fields):
+                    found[uuid] = {field: item[field] for field in fields}
+        return found
+
+    def put_many(self, items):
+        """
+        Add records to the cache.
+
+        Parameters
+        ----------
+        items : dict
+            Record uuid -> dict with `record_id` and/or `record_content`.
+        """
+        items = {
+            uuid: {field: item[field] for field in RECORD_FIELDS if field in item}
+            for uuid, item in items.items()
+        }
+        with self.__lock:
+            for uuid, item in items.items():
+                self.__remember(uuid, item)
+        if self.path is None or len(items) == 0:
+            return
+        rows = [
+            (self.__namespace, uuid)
+            + tuple(
+                json.dumps(item[field]) if field in item else None
+                for field in RECORD_FIELDS
+            )
+            for uuid, item in items.items()
+        ]
+        with closing(self.__connect()) as connection, connection:
+            connection.executemany(
+                "INSERT INTO records VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (namespace, uuid) DO UPDATE SET"
+                " record_id = COALESCE(excluded.record_id, record_id),"
+                " record_content = COALESCE(excluded.record_content, record_content)",
+                rows,
+            )
@@ -0,0 +1,512 @@
+import json
+import sqlite3
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from meganno_client.constants import (
+    DEFAULT_LIST_LIMIT,
+    REPLICA_MAX_AGE_SECONDS,
+    REPLICA_PAGE_SIZE,
+    VERIFIED_STATUSES,
+)
+from meganno_client.helpers import get_annotation_hash, merge_items
+from meganno_client.local_search import LocalSearch
+from meganno_client.subset import Subset
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    uuid TEXT PRIMARY KEY, position INTEGER, item TEXT
+);
+CREATE TABLE IF NOT EXISTS record_metadata (
+    uuid TEXT, name TEXT, item TEXT, PRIMARY KEY (uuid, name)
+);
+CREATE TABLE IF NOT EXISTS annotations (
+    uuid TEXT PRIMARY KEY, hash INTEGER, item TEXT
+);
+CREATE TABLE IF NOT EXISTS verifications (
+    uuid TEXT, label_name TEXT, label_level TEXT, item TEXT
+);
+CREATE INDEX IF NOT EXISTS verifications_uuid ON verifications (uuid);
+CREATE TABLE IF NOT EXISTS stale (uuid TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def iter_metadata(metadata_list):
+    """
+    Yield the `(name, value)` pairs of a metadata list of a view item
+    (`record_metadata` of records, `metadata_list` of labels), made of
+    `{"metadata_name": ..., "metadata_value": ...}` entries.
+    """
+    for entry in metadata_list or []:
+        yield entry["metadata_name"], entry["metadata_value"]
+
+
+class Replica:
+    """
+    The Replica class keeps an on-disk SQLite mirror of a project: records,
+    record metadata, annotations and verifications. Syncs only download
+    record contents for new records and reconciliation data for records
+    whose annotations changed, detected from hashes of the annotation view.
+
+    While the replica is fresh (synced less than `max_age` seconds ago),
+    `Subset.value`, `get_view_record`, `get_view_annotation`,
+    `get_view_verification` and `Service.get_reconciliation_data` read from
+    it. Records changed through the service are marked stale and read from
+    the backend until the next sync.
+
+    Attributes
+    ----------
+    path : str
+        Location of the SQLite database.
+    max_age : float
+        Seconds after a sync during which the replica is read from.
+    __service : Service
+        Connected backend service.
+    __local_search : LocalSearch
+        Search engine over the replica, built on first use after each sync.
+    """
+
+    def __init__(self, service, path, max_age=REPLICA_MAX_AGE_SECONDS):
+        """
+        Init function
+
+        Parameters
+        ----------
+        service : Service
+            Service-class object of the project to mirror.
+        path : str
+            Location of the SQLite database. Created if it does not exist;
+            an existing replica is brought up to date by `sync`. A replica
+            can only be opened by the project (host and project) it mirrors.
+        max_age : float
+            Seconds after a sync during which the replica is read from.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.__service = service
+        self.__local_search = None
+        with closing(self.__connect()) as connection, connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            namespace = service.get_service_endpoint()
+            replicated = self.__get_state(connection, "namespace")
+            if replicated is None:
+                self.__set_state(connection, "namespace", namespace)
+            elif replicated != namespace:
+                raise Exception(
+                    f"The replica at {path} mirrors {replicated}, not {namespace}."
+                )
+
+    def __connect(self):
+        # one connection per call, so that the replica can be read from the
+        # worker threads of paged downloads
+        return sqlite3.connect(self.path, timeout=30)
+
+    def __get_state(self, connection, key, default=None):
+        row = connection.execute(
+            "SELECT value FROM state WHERE key = ?", (key,)
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def __set_state(self, connection, key, value):
+        connection.execute(
+            "INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def get_synced_at(self):
+        """
+        Get the time of the last completed sync, or None.
+        """
+        with closing(self.__connect()) as connection:
+            return self.__get_state(connection, "synced_at")
+
+    def is_fresh(self):
+        """
+        Whether the last sync is recent enough to read from the replica.
+        """
+        synced_at = self.get_synced_at()
+        return synced_at is not None and time.time() - synced_at <= self.max_age
+
+    def sync(self, record_meta_names=None, label_meta_names=None):
+        """
+        Bring the replica up to date with the backend.
+
+        Parameters
+        ----------
+        record_meta_names : list
+            Record-level metadata to mirror, added to the names of previous
+            syncs. Metadata can change, so their values are downloaded again
+            on every sync.
+        label_meta_names : list
+            Label-level metadata whose changes make a record's annotations
+            download again, added to the names of previous syncs. Changes of
+            labels (record and span level) always do.
+
+        Returns
+        -------
+        stats : dict
+            Number of `records`, and of `new_records`, `changed_annotations`
+            and `removed_records` since the previous sync.
+        """
+        service = self.__service
+        with closing(self.__connect()) as connection, connection:
+            # not fresh while syncing: views below are read from the backend,
+            # and a failed sync leaves the replica unused
+            connection.execute("DELETE FROM state WHERE key = 'synced_at'")
+            meta_names = self.__get_state(connection, "record_meta_names", [])
+            meta_names += [
+                name for name in record_meta_names or [] if name not in meta_names
+            ]
+            label_meta_names = self.__get_state(
+                connection, "label_meta_names", []
+            ) + list(label_meta_names or [])
+            label_meta_names = list(dict.fromkeys(label_meta_names))
+            known = {
+                uuid: annotation_hash
+                for uuid, annotation_hash in connection.execute(
+                    "SELECT records.uuid, hash FROM records"
+                    " LEFT JOIN annotations USING (uuid)"
+                )
+            }
+            stale = {uuid for (uuid,) in connection.execute("SELECT uuid FROM stale")}
+        n = service.get_statistics().get_label_progress()["total"]
+        uuid_list, new, changed = [], [], {}
+        for page in service.iter_search(page_size=REPLICA_PAGE_SIZE, limit=n):
+            for item in page.get_view_annotation(
+                label_meta_names=label_meta_names or None
+            ):
+                uuid = item["uuid"]
+                # shifted into the signed 64-bit range of SQLite integers
+                annotation_hash = get_annotation_hash(item["annotation_list"]) - 2**63
+                uuid_list.append(uuid)
+                if uuid not in known:
+                    new.append(uuid)
+                if known.get(uuid) != annotation_hash or uuid in stale:
+                    changed[uuid] = annotation_hash
+        removed = set(known) - set(uuid_list)
+        labels = [
+            (label["name"], label["level"])
+            for schema in service.get_schemas().value(active=True)[:1]
+            for label in schema["schemas"]["label_schema"]
+        ]
+
+        with closing(self.__connect()) as connection, connection:
+            for start in range(0, len(new), REPLICA_PAGE_SIZE):
+                page = Subset(service, new[start : start + REPLICA_PAGE_SIZE])
+                connection.executemany(
+                    "INSERT OR REPLACE INTO records VALUES (?, NULL, ?)",
+                    [
+                        (record["uuid"], json.dumps(record))
+                        for record in page.get_view_record(
+                            record_id=True, record_content=True
+                        )
+                    ],
+                )
+            connection.executemany(
+                "UPDATE records SET position = ? WHERE uuid = ?",
+                [(position, uuid) for position, uuid in enumerate(uuid_list)],
+            )
+            changed_list = list(changed)
+            for items in service.iter_reconciliation_data(
+                uuid_list=changed_list, by_batch=True
+            ):
+                connection.executemany(
+                    "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?)",
+                    [
+                        (item["uuid"], changed[item["uuid"]], json.dumps(item))
+                        for item in items
+                    ],
+                )
+            for start in range(0, len(uuid_list), REPLICA_PAGE_SIZE):
+                page = Subset(service, uuid_list[start : start + REPLICA_PAGE_SIZE])
+                for name in meta_names:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO record_metadata VALUES (?, ?, ?)",
+                        [
+                            (item.pop("uuid"), name, json.dumps(item))
+                            for item in page.get_view_record(
+                                record_id=False,
+                                record_content=False,
+                                record_meta_names=[name],
+                            )
+                        ],
+                    )
+                connection.executemany(
+                    "DELETE FROM verifications WHERE uuid = ?",
+                    [(uuid,) for uuid in page.get_uuid_list()],
+                )
+                for label_name, label_level in labels:
+                    connection.executemany(
+                        "INSERT INTO verifications VALUES (?, ?, ?, ?)",
+                        [
+                            (
+                                item.get("uuid"),
+                                label_name,
+                                label_level,
+                                json.dumps(item),
+                            )
+                            for item in page.get_view_verification(
+                                label_name=label_name, label_level=label_level
+                            )
+                        ],
+                    )
+            for table in ["records", "record_metadata", "annotations", "verifications"]:
+                connection.executemany(
+                    f"DELETE FROM {table} WHERE uuid = ?", [(uuid,) for uuid in removed]
+                )
+            # records changed during the sync stay stale
+            connection.executemany(
+                "DELETE FROM stale WHERE uuid = ?", [(uuid,) for uuid in stale]
+            )
+            self.__set_state(connection, "record_meta_names", meta_names)
+            self.__set_state(connection, "label_meta_names", label_meta_names)
+            self.__set_state(connection, "synced_at", time.time())
+        self.__local_search = None
+        return {
+            "records": len(uuid_list),
+            "new_records": len(new),
+            "changed_annotations": len(changed),
+            "removed_records": len(removed),
+        }
+
+    def get_frames(self):
+        """
+        Load the replica as columns for `LocalSearch`.
+
+        Returns
+        -------
+        frames : dict
+            DataFrames `records` (`uuid`, `content`, in importing order),
+            `metadata` (`uuid`, `name`, `value`), `labels` (`uuid`,
+            `annotator`, `label_name`, `value`, one row per label value),
+            `label_metadata` (`uuid`, `annotator`, `label_name`, `name`,
+            `value`) and `verifications` (`uuid`, `label_name`, `verified`).
+        """
+        with closing(self.__connect()) as connection:
+            records = [
+                (uuid, json.loads(item).get("record_content"))
+                for uuid, item in connection.execute(
+                    "SELECT uuid, item FROM records ORDER BY position"
+                )
+            ]
+            metadata = [
+                (uuid, name, value)
+                for uuid, name, item in connection.execute(
+                    "SELECT uuid, name, item FROM record_metadata"
+                )
+                for key, value in iter_metadata(json.loads(item).get("record_metadata"))
+                if key == name
+            ]
+            labels, label_metadata = [], []
+            for (item,) in connection.execute("SELECT item FROM annotations"):
+                item = json.loads(item)
+                for annotation in item["annotation_list"]:
+                    for label in annotation.get("labels_record", []) + annotation.get(
+                        "labels_span", []
+                    ):
+                        key = (
+                            item["uuid"],
+                            annotation["annotator"],
+                            label["label_name"],
+                        )
+                        values = label.get("label_value")
+                        for value in values if isinstance(values, list) else [values]:
+                            labels.append(key + (value,))
+                        for name, value in iter_metadata(label.get("metadata_list")):
+                            label_metadata.append(key + (name, value))
+            verifications = [
+                (
+                    uuid,
+                    label_name,
+                    any(
+                        verification.get("verified_status") in VERIFIED_STATUSES
+                        for verification in json.loads(item).get(
+                            "verification_list", []
+                        )
+                    ),
+                )
+                for uuid, label_name, item in connection.execute(
+                    "SELECT uuid, label_name, item FROM verifications"
+                )
+            ]
+        return {
+            "records": pd.DataFrame(records, columns=["uuid", "content"]),
+            "metadata": pd.DataFrame(metadata, columns=["uuid", "name", "value"]),
+            "labels": pd.DataFrame(
+                labels, columns=["uuid", "annotator", "label_name", "value"]
+            ),
+            "label_metadata": pd.DataFrame(
+                label_metadata,
+                columns=["uuid", "annotator", "label_name", "name", "value"],
+            ),
+            "verifications": pd.DataFrame(
+                verifications, columns=["uuid", "label_name", "verified"]
+            ).astype({"verified": bool}),
+        }
+
+    def search(self, limit=DEFAULT_LIST_LIMIT, skip=0, **conditions):
+        """
+        Evaluate the predicates of `Service.search` on the replica, without
+        network calls. Results reflect the last sync.
+        See `LocalSearch.search`.
+        """
+        if self.__local_search is None:
+            self.__local_search = LocalSearch(self.__service, self.get_frames())
+        return self.__local_search.search(limit=limit, skip=skip, **conditions)
+
+    def mark_stale(self, uuid_list):
+        """
+        Read the annotations and verifications of these records from the
+        backend until the next sync, e.g. after they were changed.
+        """
+        with closing(self.__connect()) as connection, connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO stale VALUES (?)",
+                [(uuid,) for uuid in uuid_list],
+            )
+
+    def discard_metadata(self, meta_name):
+        """
+        Drop the mirrored values of a record-level metadata, e.g. after it
+        was set again, until the next sync.
+        """
+        with closing(self.__connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM record_metadata WHERE name = ?", (meta_name,)
+            )
+
+    def __select(self, uuid_list, query, parameters=()):
+        """
+        Run `query` joined with `uuid_list` as the temporary table `wanted`
+        (`position`, `uuid`), and return its rows.
+        """
+        with closing(self.__connect()) as connection:
+            connection.execute(
+                "CREATE TEMP TABLE wanted (position INTEGER PRIMARY KEY, uuid TEXT)"
+            )
+            connection.executemany(
+                "INSERT INTO wanted VALUES (?, ?)", enumerate(uuid_list)
+            )
+            return connection.execute(query, parameters).fetchall()
+
+    def __get_items(self, table, uuid_list):
+        """
+        Get the items of `table` for `uuid_list`, in order, or None if any
+        record is missing, or stale for tables other than `records`.
+        """
+        rows = self.__select(
+            uuid_list,
+            f"SELECT item, stale.uuid FROM wanted LEFT JOIN {table} USING (uuid)"
+            " LEFT JOIN stale USING (uuid) ORDER BY wanted.position",
+        )
+        if any(item is None for item, _ in rows):
+            return None
+        if table != "records" and any(stale is not None for _, stale in rows):
+            return None
+        return [json.loads(item) for item, _ in rows]
+
+    def get_view_record(
+        self, uuid_list, record_id=None, record_content=None, record_meta_names=None
+    ):
+        """
+        Mirror of `Subset.get_view_record`, or None if some records or
+        metadata are not in the replica.
+        """
+        records = self.__get_items("records", uuid_list)
+        if records is None:
+            return None
+        for name in record_meta_names or []:
+            rows = self.__select(
+                uuid_list,
+                "SELECT item FROM wanted LEFT JOIN record_metadata"
+                " ON record_metadata.uuid = wanted.uuid AND name = ?"
+                " ORDER BY wanted.position",
+                (name,),
+            )
+            if any(item is None for (item,) in rows):
+                return None
+            for record, (item,) in zip(records, rows):
+                merge_items(record, json.loads(item))
+        for record in records:
+            if not record_id:
+                record.pop("record_id", None)
+            if record_content is False:
+                record.pop("record_content", None)
+        return records
+
+    def get_reconciliation_data(self, uuid_list):
+        """
+        Mirror of `Service.get_reconciliation_data`, or None if some records
+        are not in the replica or stale.
+        """
+        return self.__get_items("annotations", uuid_list)
+
+    def get_annotation_list(self, uuid_list, annotator_list=None):
+        """
+        Mirror of `Subset.value`: data and annotations of the records,
+        restricted to the annotators of `annotator_list`.
+        """
+        items = self.get_reconciliation_data(uuid_list)
+        if items is None or annotator_list is None:
+            return items
+        for item in items:
+            item["annotation_list"] = [
+                annotation
+                for annotation in item["annotation_list"]
+                if annotation["annotator"] in annotator_list
+            ]
+        return items
+
+    def get_view_annotation(self, uuid_list, annotator_list=None, label_names=None):
+        """
+        Mirror of `Subset.get_view_annotation` without label metadata.
+        """
+        items = self.get_annotation_list(uuid_list, annotator_list=annotator_list)
+        if items is None:
+            return None
+        view = []
+        for item in items:
+            annotation_list = item["annotation_list"]
+            if label_names is not None:
+                annotation_list = [
+                    {
+                        **annotation,
+                        "labels_record": [
+                            label
+                            for label in annotation.get("labels_record", [])
+                            if label["label_name"] in label_names
+                        ],
+                        "labels_span": [
+                            label
+                            for label in annotation.get("labels_span", [])
+                            if label["label_name"] in label_names
+                        ],
+                    }
+                    for annotation in annotation_list
+                ]
+            view.append({"uuid": item["uuid"], "annotation_list": annotation_list})
+        return view
+
+    def get_view_verification(self, uuid_list, label_name, label_level):
+        """
+        Mirror of `Subset.get_view_verification` without filters, or None
+        if some records are not in the replica or stale.
+        """
+        (missing,) = self.__select(
+            uuid_list,
+            "SELECT COUNT(*) FROM wanted LEFT JOIN records USING (uuid)"
+            " LEFT JOIN stale USING (uuid)"
+            " WHERE records.uuid IS NULL OR stale.uuid IS NOT NULL",
+        )[0]
+        if missing > 0:
+            return None
+        rows = self.__select(
+            uuid_list,
+            "SELECT item FROM wanted JOIN verifications USING (uuid)"
+            " WHERE label_name = ? AND label_level = ? ORDER BY wanted.position",
+            (label_name, label_level),
+        )
+        return [json.loads(item) for (item,) in rows]
@@ -1,6 +1,3 @@
-from meganno_client.helpers import get_request, post_request
-
-
 class Schema:
     """
     The Schema class defines an annotation schema for a project.
@@ -42,7 +39,7 @@ class Schema:
         payload = self.__service.get_base_payload()
         payload["schemas"] = schemas
         path = self.__service.get_service_endpoint("set_schemas")
-        response = post_request(path, json=payload)
+        response = self.__service.transport.post(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -61,7 +58,7 @@ class Schema:
         payload = self.__service.get_base_payload()
         payload["active"] = active
         path = self.__service.get_service_endpoint("get_schemas")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -1,22 +1,65 @@
 import asyncio
-import json
+import itertools
 import math
 import time
-import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import httpx
+import numpy as np
 import pandas as pd
 import pydash
 from tqdm import tqdm
 
 from meganno_client.authentication import Authentication
-from meganno_client.constants import (BATCH_SIZE, DEFAULT_LIST_LIMIT, DNS_NAME,
-                                      HTTPX_LIMITS, REQUEST_TIMEOUT_SECONDS,
-                                      SERVICE_ENDPOINTS)
-from meganno_client.helpers import get_request, post_request
+from meganno_client.checkpoint import ImportCheckpoint, MetadataCheckpoint
+from meganno_client.codec import VECTOR_DTYPES, encode_value
+from meganno_client.concurrency import (
+    AdaptiveConcurrency,
+    post_item_list,
+    submit_annotation_list,
+)
+from meganno_client.constants import (
+    DEFAULT_LIST_LIMIT,
+    EXPORT_COLUMNS,
+    EXPORT_PAGE_SIZE,
+    IMPORT_CHUNK_SIZE,
+    IMPORT_MAX_IN_FLIGHT,
+    MAX_SEARCH_PARALLELISM,
+    RECONCILIATION_BATCH_SIZE,
+    RECONCILIATION_MAX_WORKERS,
+    RECORD_CACHE_MAX_ITEMS,
+    REPLICA_MAX_AGE_SECONDS,
+    SEARCH_PAGE_SIZE,
+    SUBMIT_MAX_CONCURRENCY,
+    VERIFIED_STATUSES,
+)
+from meganno_client.helpers import (
+    AsyncTransport,
+    Transport,
+    get_annotation_hash,
+    get_assignment_uuids,
+    get_export_columns,
+    get_export_df,
+    get_export_schema,
+    get_export_table,
+    get_record_hashes,
+    get_response_json,
+    get_search_filter,
+    get_search_windows,
+    get_service_endpoint,
+    get_state_path,
+    get_submission,
+    get_user,
+    normalize_export,
+)
+from meganno_client.export_state import ExportState
+from meganno_client.record_cache import RecordCache
+from meganno_client.replica import Replica
 from meganno_client.schema import Schema
 from meganno_client.statistic import Statistic
 from meganno_client.subset import Subset
+from meganno_client.uuid_array import UUIDArray
 
 
 class Service:
@@ -27,7 +70,9 @@ class Service:
 
     """
 
-    def __init__(self, host=None, project=None, token=None, auth=None, port=5000):
+    def __init__(
+        self, host=None, project=None, token=None, auth=None, port=5000, transport=None
+    ):
         """
         Init function
 
@@ -44,6 +89,10 @@ class Service:
         auth : Authentication
             Authentication object.
             Can be skipped if a valid token is provided.
+        transport : Transport, optional
+            Pooled HTTP transport to send requests through.
+            If None, reuse the transport of `auth` when given, otherwise
+            create a new one owned by this service.
         """
         if pydash.is_empty(project):
             raise Exception("Project cannot be None or empty.")
@@ -56,7 +105,17 @@ class Service:
         self.host = host
         self.user = None
         self.version = None
-        response = get_request(
+        self.__own_transport = False
+        self.__submission_stats = None
+        self.__replica = None
+        self.__record_cache = None
+        if transport is None and auth is not None:
+            transport = auth.transport
+        if transport is None:
+            transport = Transport()
+            self.__own_transport = True
+        self.transport: Transport = transport
+        response = self.transport.get(
             path=self.get_service_endpoint() + "?url_check=1", timeout=5
         )
         if response.status_code == 200:
@@ -67,6 +126,14 @@ class Service:
     def get_version(self):
         return self.version
 
+    def close(self):
+        """
+        Release pooled connections held by the service.
+        Transports shared with other objects are left open.
+        """
+        if self.__own_transport:
+            self.transport.close()
+
     def show(self, config={}):
         """
         Show project management dashboard in a floating dashboard.
@@ -105,12 +172,7 @@ class Service:
             a dictionary `SERVICE_ENDPOINTS` in `constants.py`.
 
         """
-        dns_name = DNS_NAME
-        if self.host is not None:
-            dns_name = self.host
-        return (
-            f"{dns_name}:{self.port}/" + self.project + SERVICE_ENDPOINTS.get(key, "")
-        )
+        return get_service_endpoint(self.host, self.port, self.project, key)
 
     def get_base_payload(self):
         """
@@ -146,11 +208,7 @@ class Service:
             path = self.get_service_endpoint("get_users_by_uids")
             payload = self.get_base_payload()
             payload.update({"uids": uids})
-            response = get_request(path, json=payload)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(response.text)
+            return get_response_json(self.transport.get(path, json=payload))
         return {}
 
     def get_annotator(self):
@@ -166,15 +224,10 @@ class Service:
             if not pydash.is_empty(token):
                 path = self.get_service_endpoint("get_user")
                 payload = self.get_base_payload()
-                response = post_request(path, json=payload)
-                if response.status_code == 200:
-                    parsed_result = response.json()
-                else:
-                    raise Exception(response.text)
-            self.user = {
-                "name": parsed_result.get("username"),
-                "user_id": parsed_result.get("user_id"),
-            }
+                parsed_result = get_response_json(
+                    self.transport.post(path, json=payload)
+                )
+            self.user = get_user(parsed_result)
         return self.user
 
     def search(
@@ -189,6 +242,8 @@ class Service:
         label_condition=None,
         label_metadata_condition=None,
         verification_condition=None,
+        parallelism=1,
+        local=False,
     ):
         """
         Search the back-end database based on user-provided predicates.
@@ -196,6 +251,7 @@ class Service:
         ------
         limit: int
             The limit of returned records in the subest.
+            With `parallelism` > 1, None means all matching records.
         skip: int
             skip index of returned subset
             (excluding the first `skip` rows from the raw results ordered by importing order).
@@ -227,40 +283,78 @@ class Service:
             verification condition of the annotation.
             {"label_name": # name of the associated label
              "search_mode":"ALL"|"UNVERIFIED"|"VERIFIED"}
+        parallelism: int
+            Number of concurrent requests used to fetch the results.
+            The `limit`/`skip` range is split into that many windows
+            (capped by `MAX_SEARCH_PARALLELISM`) whose uuid lists are
+            merged back in importing order.
+        local: bool
+            If True, evaluate the predicates on the replica set up by
+            `replicate` (as of its last sync) without network calls.
+            With `limit` None, all matching records are returned.
 
         Returns
         -------
         subset : Subset
             Subset meeting the search conditions.
         """
+        if local:
+            if self.__replica is None:
+                raise Exception("Local search requires a replica, see `replicate`.")
+            return self.__replica.search(
+                limit=limit,
+                skip=skip,
+                uuid_list=uuid_list,
+                keyword=keyword,
+                regex=regex,
+                record_metadata_condition=record_metadata_condition,
+                annotator_list=annotator_list,
+                label_condition=label_condition,
+                label_metadata_condition=label_metadata_condition,
+                verification_condition=verification_condition,
+            )
+        if parallelism > 1 and limit is None:
+            limit = max(self.get_statistics().get_label_progress()["total"] - skip, 0)
+        windows = get_search_windows(
+            skip, limit, min(parallelism, MAX_SEARCH_PARALLELISM)
+        )
+        conditions = dict(
+            uuid_list=uuid_list,
+            keyword=keyword,
+            regex=regex,
+            record_metadata_condition=record_metadata_condition,
+            annotator_list=annotator_list,
+            label_condition=label_condition,
+            label_metadata_condition=label_metadata_condition,
+            verification_condition=verification_condition,
+        )
+        if len(windows) == 1:
+            data_uuids = self.__search_uuids(
+                get_search_filter(limit=windows[0][1], skip=windows[0][0], **conditions)
+            )
+            return Subset(data_uuids=data_uuids, service=self)
+        with ThreadPoolExecutor(max_workers=len(windows)) as executor:
+            results = executor.map(
+                lambda window: self.__search_uuids(
+                    get_search_filter(limit=window[1], skip=window[0], **conditions)
+                ),
+                windows,
+            )
+            data_uuids = [uuid for result in results for uuid in result]
+        return Subset(data_uuids=data_uuids, service=self)
+
+    def __search_uuids(self, filter):
+        """
+        Send a single search request and return the matching record uuids.
+        Parameters
+        ------
+        filter: dict
+            Search filter built by `helpers.get_search_filter`.
+        """
         payload = self.get_base_payload()
-        filter = {
-            "limit": limit,
-            "skip": skip,
-        }
-        if keyword is not None:
-            filter["keyword"] = keyword
-        if uuid_list is not None:
-            filter["uuid_list"] = uuid_list
-        if regex is not None:
-            filter["regex"] = regex
-        if record_metadata_condition is not None:
-            filter["record_metadata_condition"] = record_metadata_condition
-        if annotator_list is not None:
-            filter["annotator_list"] = annotator_list
-        if label_condition is not None:
-            filter["label_condition"] = label_condition
-        if label_metadata_condition is not None:
-            filter["label_metadata_condition"] = label_metadata_condition
-        if verification_condition is not None:
-            filter["verification_condition"] = verification_condition
         payload.update(filter)
         path = self.get_service_endpoint("search")
-        response = get_request(path, json=payload)
-        if response.status_code == 200:
-            return Subset(data_uuids=response.json(), service=self)
-        else:
-            raise Exception(response.text)
+        return get_response_json(self.transport.get(path, json=payload))
 
     def search_by_job(
         self,
@@ -289,6 +383,83 @@ class Service:
         )
         return Subset(data_uuids=ret.get_uuid_list(), service=self, job_id=job_id)
 
+    def iter_search(
+        self,
+        page_size=SEARCH_PAGE_SIZE,
+        skip=0,
+        limit=None,
+        by_record=False,
+        prefetch=True,
+        **conditions,
+    ):
+        """
+        Stream search results page by page, in importing order.
+        The iterator keeps an offset cursor into the result list and, while
+        the caller works on the current page, the next page is already
+        being fetched in the background.
+
+        Parameters
+        ------
+        page_size: int
+            Number of records requested per page.
+        skip: int
+            Number of leading results to skip before the first page.
+        limit: int
+            Maximum number of records to yield in total.
+            If None, iterate until the results are exhausted.
+        by_record: bool
+            If True, yield record uuids one at a time instead of Subset pages.
+        prefetch: bool
+            If True, request the next page while the current one is consumed.
+        conditions:
+            Search predicates, see `search` (e.g. `keyword`, `label_condition`).
+
+        Returns
+        -------
+        pages : generator
+            Generator of Subset pages, or of record uuids if `by_record` is True.
+
+        Example
+        ----
+        ```python
+        for page in demo.iter_search(page_size=1000, keyword="delay"):
+            records = page.get_view_record()
+        ```
+        """
+        if page_size <= 0:
+            raise Exception("page_size must be a positive integer.")
+
+        def fetch(offset):
+            size = page_size if limit is None else min(page_size, skip + limit - offset)
+            if size <= 0:
+                return []
+            return self.__search_uuids(
+                get_search_filter(limit=size, skip=offset, **conditions)
+            )
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            offset = skip
+            future = executor.submit(fetch, offset) if prefetch else None
+            while True:
+                data_uuids = future.result() if prefetch else fetch(offset)
+                offset += len(data_uuids)
+                exhausted = len(data_uuids) < page_size or (
+                    limit is not None and offset >= skip + limit
+                )
+                if prefetch and not exhausted:
+                    future = executor.submit(fetch, offset)
+                if len(data_uuids) > 0:
+                    if by_record:
+                        yield from data_uuids
+                    else:
+                        yield Subset(data_uuids=data_uuids, service=self)
+                if exhausted:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
     def deprecate_submit_annotations(self, subset=None, uuid_list=[]):
         # To be deprecated. Default to submit annotations as a batch
         """
@@ -308,22 +479,16 @@ class Service:
         if pydash.is_empty(subset):
             raise Exception("Subset can not be None.")
         annotator_user_id = self.get_annotator()["user_id"]
-        client = httpx.AsyncClient(limits=HTTPX_LIMITS, timeout=REQUEST_TIMEOUT_SECONDS)
 
-        async def submit_annotation_by_uuid(uuid):
+        async def submit_annotation_by_uuid(transport, uuid):
             annotation_data = subset.get_annotation_by_uuid(uuid)
             if annotation_data is not None:
                 payload = self.get_base_payload()
-                own = list(
-                    filter(
-                        lambda annotation: annotation["annotator"] == annotator_user_id,
-                        annotation_data["annotation_list"],
-                    )
-                )
-                payload.update({"labels": {} if len(own) == 0 else own[0]})
+                submission = get_submission(uuid, annotation_data, annotator_user_id)
+                payload.update({"labels": submission["labels"]})
                 path = self.get_service_endpoint("set_annotations").format(uuid=uuid)
                 try:
-                    response = await client.post(path, json=payload)
+                    response = await transport.post(path, json=payload)
                     if response.status_code == 200:
                         return response.json()
                     else:
@@ -333,12 +498,11 @@ class Service:
                 except Exception as e:
                     return {"uuid": uuid, "error": str(e)}
 
-        async def main():
-            return await asyncio.gather(
-                *[submit_annotation_by_uuid(uuid=uuid) for uuid in uuid_list]
+        return self.__run_pipeline(
+            lambda transport: asyncio.gather(
+                *[submit_annotation_by_uuid(transport, uuid) for uuid in uuid_list]
             )
-
-        return asyncio.run(main())
+        )
 
     def submit_annotations(self, subset=None, uuid_list=[]):
         """
@@ -354,98 +518,237 @@ class Service:
             Additional filter. Only subset records whose uuid are in this list
             will be submitted.
 
+        Batches are sent concurrently; their size and the number in flight
+        adapt to backend latency and overload responses
+        (see `AdaptiveConcurrency` and `get_submission_stats`).
+        Overloaded batches are retried with backoff under an idempotency key,
+        and batches rejected as invalid (400/422) are split until only the
+        invalid records are reported with an error.
+
+        Raises
+        ------
+        Exception
+            If subset is None, or if a batch is rejected for any other
+            reason (e.g. expired token or unknown project).
+
+        Returns
+        -------
+        results : list
+            Per-record results of the backend, or `{"uuid": ..., "error": ...}`
+            for invalid records and records still failing after retries.
+
         """
         if pydash.is_empty(subset):
             raise Exception("Subset can not be None.")
-        client = httpx.AsyncClient(limits=HTTPX_LIMITS, timeout=REQUEST_TIMEOUT_SECONDS)
+        annotator_user_id = self.get_annotator()["user_id"]
+        annotation_list = []
+        for uuid in uuid_list:
+            annotation_data = subset.get_annotation_by_uuid(uuid)
+            if annotation_data is not None:
+                annotation_list.append(
+                    get_submission(uuid, annotation_data, annotator_user_id)
+                )
+        path = self.get_service_endpoint("submit_annotations_batch")
+        controller = AdaptiveConcurrency()
+        if self.__replica is not None:
+            # also covers the batches committed before a failure
+            self.__replica.mark_stale(uuid_list)
+        ret = self.__run_pipeline(
+            lambda transport: submit_annotation_list(
+                transport, path, self.get_base_payload(), annotation_list, controller
+            )
+        )
+        self.__submission_stats = controller.get_stats()
+        failed = {r["uuid"] for r in ret if "error" in r}
+        subset.mark_clean([uuid for uuid in uuid_list if uuid not in failed])
+        return ret
 
-        async def submit_annotation_by_uuid_batch(uuids):
-            payload = self.get_base_payload()
-            annotator_user_id = self.get_annotator()["user_id"]
-            annotation_list = []
-
-            for uuid in uuids:
-                annotation_data = subset.get_annotation_by_uuid(uuid)
-                if annotation_data is not None:
-                    own = list(
-                        filter(
-                            lambda annotation: annotation["annotator"]
-                            == annotator_user_id,
-                            annotation_data["annotation_list"],
-                        )
-                    )
-                    own_annotation = {
-                        "record_uuid": uuid,
-                        "labels": {} if len(own) == 0 else own[0],
-                    }
-                    annotation_list.append(own_annotation)
-
-            if annotation_list:
-                parameters = {"annotation_list": annotation_list}
-                payload.update(parameters)
-                path = self.get_service_endpoint("submit_annotations_batch")
-                try:
-                    response = await client.post(path, json=payload)
-                    if response.status_code == 200:
-                        return response.json()
-                    else:
-                        return [
-                            {"uuid": uuid, "error": response.text} for uuid in uuids
-                        ]
-                except httpx.TimeoutException:
-                    return [
-                        {"uuid": uuid, "error": "408 Request Timeout"} for uuid in uuids
-                    ]
-                except Exception as e:
-                    return [{"uuid": uuid, "error": str(e)} for uuid in uuids]
-            else:
-                return []
+    def get_submission_stats(self):
+        """
+        Get statistics of the last `submit_annotations` call.
 
-        async def main():
-            index = 0
-            batches = []
-            while index < len(uuid_list):
-                chunk = uuid_list[index : index + BATCH_SIZE]
-                index += BATCH_SIZE
-                batches.append(chunk)
-            # results is a list of list(s)
-            results = await asyncio.gather(
-                *[submit_annotation_by_uuid_batch(uuids=batch) for batch in batches]
+        Returns
+        -------
+        stats : dict
+            Confirmed `records`, `requests` sent, `overloads` (429/5xx/timeout
+            responses), elapsed `seconds`, `throughput` in records per second,
+            and the final and peak `batch_size` and `concurrency` chosen by
+            the adaptive controller. None before the first submission.
+        """
+        return self.__submission_stats
+
+    def get_reconciliation_data(self, uuid_list=[]):
+        """
+        Get reconciliation data for the given records, from the replica if
+        it is fresh (see `replicate`).
+        See `Subset.get_reconciliation_data` and `iter_reconciliation_data`.
+        """
+        replica = self.get_replica()
+        if replica is not None and not pydash.is_empty(uuid_list):
+            items = replica.get_reconciliation_data(uuid_list)
+            if items is not None:
+                return items
+        return list(self.iter_reconciliation_data(uuid_list=uuid_list))
+
+    def replicate(
+        self,
+        path=None,
+        record_meta_names=None,
+        max_age=REPLICA_MAX_AGE_SECONDS,
+        label_meta_names=None,
+    ):
+        """
+        Keep an on-disk SQLite mirror of the project's records, record
+        metadata, annotations and verifications, and sync it. Call again
+        (or `Replica.sync`) to bring it up to date: only new records and
+        records whose annotations changed are downloaded again.
+
+        While the replica is fresh, `Subset.value`, `get_view_record`,
+        `get_view_annotation`, `get_view_verification` and
+        `get_reconciliation_data` read from it instead of the backend.
+        Records changed through this service are read from the backend
+        until the next sync.
+
+        Parameters
+        ----------
+        path : str
+            Location of the SQLite database, reused across sessions.
+            Defaults to a file under `~/.meganno` keyed by host and project.
+        record_meta_names : list
+            Record-level metadata to mirror, in addition to those of
+            previous syncs of the same file.
+        max_age : float
+            Seconds after a sync during which reads are served by the replica.
+        label_meta_names : list
+            Label-level metadata (e.g. "conf") whose changes also make a
+            record's annotations download again, in addition to those of
+            previous syncs of the same file.
+
+        Returns
+        -------
+        replica : Replica
+            The synced replica.
+        """
+        if path is None:
+            path = get_state_path("replica", self.get_service_endpoint())
+        if self.__replica is None or self.__replica.path != path:
+            self.__replica = Replica(self, path, max_age=max_age)
+        self.__replica.max_age = max_age
+        self.__replica.sync(
+            record_meta_names=record_meta_names, label_meta_names=label_meta_names
+        )
+        return self.__replica
+
+    def set_record_cache(self, max_items=RECORD_CACHE_MAX_ITEMS, path=None):
+        """
+        Turn on (or reconfigure) the cache of record ids and contents
+        consulted by `Subset.get_view_record`, which then only downloads the
+        contents of records not seen before. The cache is off until this is
+        called. Records are kept in memory, up to `max_items` of them with
+        their full contents, and optionally in an SQLite file.
+
+        Parameters
+        ----------
+        max_items : int
+            Number of records kept in memory, least recently used first out.
+        path : str
+            SQLite file of an on-disk tier, which several processes on the
+            same host can share. None for memory only.
+
+        Returns
+        -------
+        record_cache : RecordCache
+            The new cache, or None if `max_items` is 0 and `path` None.
+        """
+        if max_items <= 0 and path is None:
+            self.__record_cache = None
+        else:
+            self.__record_cache = RecordCache(
+                namespace=self.get_service_endpoint(), max_items=max_items, path=path
             )
-            # flatten_concatenation
-            ret = []
-            for result in results:
-                ret += result
-            return ret
+        return self.__record_cache
 
-        return asyncio.run(main())
+    def get_record_cache(self):
+        """
+        Get the cache of record ids and contents, see `set_record_cache`.
+        """
+        return self.__record_cache
 
-    def get_reconciliation_data(self, uuid_list=[]):
+    def get_replica(self):
+        """
+        Get the replica set up by `replicate` if it is fresh, otherwise None.
+        """
+        if self.__replica is not None and self.__replica.is_fresh():
+            return self.__replica
+        return None
+
+    def iter_reconciliation_data(
+        self, uuid_list=[], max_workers=RECONCILIATION_MAX_WORKERS, by_batch=False
+    ):
+        """
+        Stream reconciliation data for the given records, in `uuid_list` order.
+        Batches of `RECONCILIATION_BATCH_SIZE` records are requested
+        concurrently, up to `max_workers` at a time, so that the first
+        records can be rendered before the rest arrive.
+
+        Parameters
+        ------
+        uuid_list: list
+            Uuids of the records to get reconciliation data for.
+        max_workers: int
+            Maximum number of batches in flight.
+        by_batch: bool
+            If True, yield the list of each batch instead of single records.
+
+        Returns
+        -------
+        reconciliation_data : generator
+            Generator of reconciliation data of each record, or of lists of
+            them if `by_batch` is True. See `Subset.get_reconciliation_data`
+            for the format.
+        """
         if pydash.is_empty(uuid_list):
-            return []
-        BATCH_SIZE = 45
-        # making sure the request URL doesn't exceed the 2048 characters limitation for certain browsers
-        index = 0
-        result = []
-        while index < len(uuid_list):
-            uuids = []
-            counter = 0
-            while index < len(uuid_list) and counter < BATCH_SIZE:
-                counter += 1
-                uuids.append(uuid_list[index])
-                index += 1
+            return
+        path = self.get_service_endpoint("get_reconciliation_data")
+
+        def fetch(uuids):
             payload = self.get_base_payload()
             payload.update({"uuid_list": uuids})
-            response = get_request(
-                self.get_service_endpoint("get_reconciliation_data"), json=payload
-            )
+            response = self.transport.get(path, json=payload)
             if response.status_code == 200:
-                result += response.json()
+                items = response.json()
+                if self.__record_cache is not None:
+                    self.__record_cache.put_many(
+                        {
+                            item["uuid"]: {"record_content": item["data"]}
+                            for item in items
+                            if "data" in item
+                        }
+                    )
+                return items
             else:
                 raise Exception(response.text)
-        return result
 
-    def import_data_url(self, url="", file_type="csv", column_mapping={}):
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = deque()
+            index = 0
+            while index < len(uuid_list) or futures:
+                while index < len(uuid_list) and len(futures) < max_workers:
+                    uuids = uuid_list[index : index + RECONCILIATION_BATCH_SIZE]
+                    index += len(uuids)
+                    futures.append(executor.submit(fetch, uuids))
+                result = futures.popleft().result()
+                if by_batch:
+                    yield result
+                else:
+                    yield from result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def import_data_url(
+        self, url="", file_type="csv", column_mapping={}, dedup=False, checkpoint=None
+    ):
         """
         Import data from a public url, currently only supporting csv files.
         Each row corresponds to a data record. The file needs at least two columns:
@@ -463,23 +766,54 @@ class Service:
             ```json
             --8<-- "docs/assets/code/column_mapping/basic.json"
             ```
+        dedup : bool
+            If True, skip rows whose id and content are already in the
+            project, e.g. to resume an interrupted import. The file is then
+            read by the client and uploaded in chunks (see `import_data_df`)
+            instead of being fetched by the backend.
+        checkpoint : str
+            Path of a local state file of `dedup`, see `import_data_df`.
         """
+        if dedup:
+            if file_type.lower() != "csv":
+                raise Exception("Only csv files are supported.")
+            header = pd.read_csv(url, nrows=0).columns
+            filtered_columns, column_mapping = self.__get_import_columns(
+                header, column_mapping
+            )
+            chunks = pd.read_csv(
+                url, usecols=filtered_columns, chunksize=IMPORT_CHUNK_SIZE
+            )
+            return self.__import_chunks(
+                chunks, column_mapping, dedup=True, checkpoint=checkpoint
+            )
         payload = self.get_base_payload()
         payload.update(
             {"url": url, "file_type": file_type, "column_mapping": column_mapping}
         )
         path = self.get_service_endpoint("post_data")
-        response = post_request(path, json=payload)
+        response = self.transport.post(path, json=payload)
         if response.status_code == 200:
             return response.text
         else:
             raise Exception(response.text)
 
-    def import_data_df(self, df, column_mapping={}):
+    def import_data_df(
+        self,
+        df,
+        column_mapping={},
+        chunk_size=IMPORT_CHUNK_SIZE,
+        max_in_flight=IMPORT_MAX_IN_FLIGHT,
+        dedup=False,
+        by_chunk=False,
+        checkpoint=None,
+    ):
         """
         Import data from a pandas DataFrame.
         Each row corresponds to a data record. The dataframe needs at least two columns:
         one with a unique id for each row, and one with the raw data content.
+        Rows are serialized and uploaded `chunk_size` at a time, so that
+        memory use does not grow with the size of the dataframe.
 
         Parameters
         ----
@@ -493,15 +827,183 @@ class Service:
             --8<-- "docs/assets/code/column_mapping/metadata.json"
             ```
             metadata with name `location` will be created for all imported data records.
+        chunk_size : int
+            Number of rows per upload request.
+        max_in_flight : int
+            Maximum number of chunks uploaded concurrently. With the default
+            of 1, the row order is the importing order (the order of
+            `search` results). Larger values upload faster, but chunks may
+            then be stored in a different order.
+        dedup : bool
+            If True, skip rows whose id and content are already in the
+            project, so that re-running an interrupted import only uploads
+            the remaining rows. Before the upload starts, this costs one
+            full scan of the project: the uuids of all records are searched,
+            and the ids and contents of the records not in `checkpoint` are
+            read and hashed, from the replica (see `replicate`) or the record
+            cache (see `set_record_cache`) when available.
+            Duplicates within `df` itself are not removed.
+        by_chunk : bool
+            If True, return the result of each chunk instead of the
+            backend messages.
+        checkpoint : str
+            Path of a local state file keeping the hashes of existing
+            records between `dedup` runs, so that the next run only reads
+            the records added since. Created if it does not exist.
+
+        Returns
+        -------
+        response : str
+            Backend message of each uploaded chunk, one per line.
+        results : list
+            If `by_chunk` is True: one dict per chunk, in row order, with
+            fields `start` (index of the first row of the chunk), `rows`
+            (number of rows inserted), `skipped` (rows already in the
+            project) and `response` (the backend message).
 
+        Raises
+        ------
+        Exception
+            On the first failed chunk, with its index and row range. The
+            rows before it were imported (and, with `max_in_flight` > 1,
+            possibly some after it): re-run with `dedup=True` to resume.
         """
 
         if not isinstance(df, pd.DataFrame):
             raise Exception("df needs to be a valid pandas dataframe")
+        filtered_columns, column_mapping = self.__get_import_columns(
+            df.columns, column_mapping
+        )
+        chunks = (
+            df.iloc[start : start + chunk_size][filtered_columns]
+            for start in range(0, len(df), chunk_size)
+        )
+        return self.__import_chunks(
+            chunks,
+            column_mapping,
+            total=math.ceil(len(df) / chunk_size),
+            max_in_flight=max_in_flight,
+            dedup=dedup,
+            by_chunk=by_chunk,
+            checkpoint=checkpoint,
+        )
+
+    def import_file(
+        self,
+        path,
+        column_mapping={},
+        file_type=None,
+        chunk_size=IMPORT_CHUNK_SIZE,
+        max_in_flight=IMPORT_MAX_IN_FLIGHT,
+        dedup=False,
+        by_chunk=False,
+        checkpoint=None,
+    ):
+        """
+        Import data from a local CSV, JSON lines or Parquet file.
+        The file is read in chunks of `chunk_size` rows (row groups for
+        Parquet, memory-mapped where possible) that are uploaded as they are
+        read, so it never needs to fit in memory at once.
+        Each row corresponds to a data record. See `import_data_df`.
+
+        Parameters
+        ----
+        path : str
+            Path of the file.
+        column_mapping : dict
+            Dictionary with fields `id`, `content` and optionally `metadata`.
+            See `import_data_df`.
+        file_type : str
+            'csv', 'jsonl' or 'parquet'. If None, inferred from the file
+            extension. Parquet requires `pyarrow`
+            (`pip install meganno_client[parquet]`).
+        chunk_size : int
+            Number of rows per upload request.
+        max_in_flight : int
+            Maximum number of chunks uploaded concurrently. See `import_data_df`.
+        dedup : bool
+            If True, skip rows already in the project. See `import_data_df`.
+        by_chunk : bool
+            If True, return the result of each chunk. See `import_data_df`.
+        checkpoint : str
+            Path of a local state file of `dedup`. See `import_data_df`.
+
+        Returns
+        -------
+        response : str | list
+            Backend messages, or the result of each chunk if `by_chunk` is
+            True. See `import_data_df`, also for the errors raised.
+        """
+        if file_type is None:
+            extension = path.rsplit(".", 1)[-1].lower()
+            file_type = {"ndjson": "jsonl", "pq": "parquet"}.get(extension, extension)
+        file_type = file_type.lower()
+        total = None
+        if file_type == "csv":
+            header = pd.read_csv(path, nrows=0).columns
+            filtered_columns, column_mapping = self.__get_import_columns(
+                header, column_mapping
+            )
+            chunks = pd.read_csv(
+                path, usecols=filtered_columns, chunksize=chunk_size, memory_map=True
+            )
+        elif file_type == "jsonl":
+            reader = pd.read_json(path, lines=True, chunksize=chunk_size)
+            first = next(iter(reader), pd.DataFrame())
+            filtered_columns, column_mapping = self.__get_import_columns(
+                first.columns, column_mapping
+            )
+            chunks = (
+                chunk[filtered_columns]
+                for chunk in itertools.chain([first], reader)
+                if len(chunk) > 0
+            )
+        elif file_type == "parquet":
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise Exception(
+                    "Importing Parquet files requires pyarrow: pip install meganno_client[parquet]"
+                )
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            filtered_columns, column_mapping = self.__get_import_columns(
+                parquet_file.schema_arrow.names, column_mapping
+            )
+            chunks = (
+                batch.to_pandas()
+                for batch in parquet_file.iter_batches(
+                    batch_size=chunk_size, columns=filtered_columns
+                )
+            )
+            total = math.ceil(parquet_file.metadata.num_rows / chunk_size)
+        else:
+            raise Exception("file_type must be one of 'csv', 'jsonl' or 'parquet'.")
+        return self.__import_chunks(
+            chunks,
+            column_mapping,
+            total=total,
+            max_in_flight=max_in_flight,
+            dedup=dedup,
+            by_chunk=by_chunk,
+            checkpoint=checkpoint,
+        )
+
+    def __get_import_columns(self, columns, column_mapping):
+        """
+        Check that the id and content columns of `column_mapping` exist.
+
+        Returns
+        -------
+        filtered_columns : list
+            Columns to upload: id, content and optional metadata.
+        column_mapping : dict
+            `column_mapping`, or the default mapping on columns named
+            'id' and 'content' if it was empty.
+        """
         filtered_columns = []
         if pydash.is_empty(column_mapping):
             # defult mapping ,check for columns "id" and "content"
-            if "id" in df.columns and "content" in df.columns:
+            if "id" in columns and "content" in columns:
                 filtered_columns.extend(["id", "content"])
                 column_mapping = {"id": "id", "content": "content"}
             else:
@@ -509,10 +1011,7 @@ class Service:
                     "Needs to provide valid column_mapping, or columns with name 'id' and 'content'."
                 )
         else:
-            if (
-                column_mapping["id"] in df.columns
-                and column_mapping["content"] in df.columns
-            ):
+            if column_mapping["id"] in columns and column_mapping["content"] in columns:
                 filtered_columns.extend(
                     [column_mapping["id"], column_mapping["content"]]
                 )
@@ -521,88 +1020,593 @@ class Service:
                     "Needs to provide valid column_mapping with fields 'id' and 'content'."
                 )
         if "metadata" in column_mapping:
+            if column_mapping["metadata"] not in columns:
+                raise Exception(
+                    f"Metadata column '{column_mapping['metadata']}' not found."
+                )
             filtered_columns.append(column_mapping["metadata"])
+        return filtered_columns, column_mapping
 
-        # filter columns to only send necessary columns.
-        # fill nan values to make json serializable.
-
-        df = df[filtered_columns].fillna("NaN")
+    def __import_chunks(
+        self,
+        chunks,
+        column_mapping,
+        total=None,
+        max_in_flight=IMPORT_MAX_IN_FLIGHT,
+        dedup=False,
+        by_chunk=False,
+        checkpoint=None,
+    ):
+        """
+        Upload an iterator of DataFrame chunks to the import endpoint.
+        At most `max_in_flight` chunks are held in memory, serialized and
+        sent at the same time; the next chunk is only read once one of them
+        completes. With `dedup`, rows matching the hash of an existing
+        record are dropped before upload. Raises on the first failed chunk,
+        in row order.
+        """
+        path = self.get_service_endpoint("post_data")
+        known_hashes = self.__get_record_hashes(checkpoint) if dedup else None
 
-        if len(df) > 1000:
-            warnings.warn(
-                "Try using 'import_data_url' for import; importing large datasets DataFrame is not advised.",
-                RuntimeWarning,
+        def upload(start, chunk):
+            # fill nan values to make json serializable.
+            chunk = chunk.fillna("NaN")
+            skipped = 0
+            if known_hashes is not None:
+                hashes = get_record_hashes(
+                    chunk[column_mapping["id"]], chunk[column_mapping["content"]]
+                )
+                new = ~np.isin(hashes, known_hashes)
+                skipped = len(chunk) - int(new.sum())
+                chunk = chunk[new]
+            result = {"start": start, "rows": len(chunk), "skipped": skipped}
+            if len(chunk) == 0:
+                return {**result, "response": "No new records"}
+            payload = self.get_base_payload()
+            payload.update(
+                {
+                    "file_type": "DF",
+                    "df_dict": chunk.to_dict(orient="records"),
+                    "column_mapping": column_mapping,
+                }
             )
-        payload = self.get_base_payload()
-        payload.update(
-            {
-                "file_type": "DF",
-                "df_dict": df.to_dict(orient="records"),
-                "column_mapping": column_mapping,
-            }
-        )
-        path = self.get_service_endpoint("post_data")
-        response = post_request(path, json=payload)
-        if response.status_code == 200:
-            return response.text
-        else:
-            raise Exception(response.text)
+            try:
+                response = self.transport.post(path, json=payload)
+            except Exception as e:
+                return {**result, "error": str(e)}
+            if response.status_code == 200:
+                return {**result, "response": response.text}
+            return {**result, "error": response.text}
+
+        results = []
+        executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        try:
+            with tqdm(total=total, leave=True, desc="Import chunks uploaded:") as tq:
+                futures = deque()
+                start = 0
+
+                def collect():
+                    result = futures.popleft().result()
+                    if "error" in result:
+                        end = result["start"] + result["rows"] + result["skipped"]
+                        raise Exception(
+                            f"Import chunk {len(results)} (rows {result['start']} to"
+                            f" {end - 1}) failed: {result['error']}"
+                        )
+                    results.append(result)
+                    tq.update()
+
+                for chunk in chunks:
+                    if len(futures) == max_in_flight:
+                        collect()
+                    futures.append(executor.submit(upload, start, chunk))
+                    start += len(chunk)
+                while futures:
+                    collect()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if by_chunk:
+            return results
+        responses = [result["response"] for result in results if result["rows"] > 0]
+        return "\n".join(responses) if responses else "No new records"
 
-    def export(self):
+    def __get_record_hashes(self, checkpoint=None):
+        """
+        Hash the id and content of every record of the project
+        (see `get_record_hashes`). Record uuids are always searched, to see
+        records imported since the last run; ids and contents are read by
+        `Subset.get_view_record`, from the replica or the record cache when
+        available, for the records whose hash is not in the `checkpoint`
+        state file yet. Up to `MAX_SEARCH_PARALLELISM` pages are fetched
+        concurrently.
+        """
+        state = None if checkpoint is None else ImportCheckpoint(checkpoint)
+        n = self.get_statistics().get_label_progress()["total"]
+        hashes = [get_record_hashes([], [])]
+        if n == 0:
+            return hashes[0]
+
+        def hash_page(page):
+            uuid_list = page.get_uuid_list()
+            known = {}
+            for uuid in uuid_list if state is not None else []:
+                record_hash = state.get_hash(uuid)
+                if record_hash is not None:
+                    known[uuid] = record_hash
+            missing = [uuid for uuid in uuid_list if uuid not in known]
+            new = {}
+            if len(missing) > 0:
+                records = Subset(service=self, data_uuids=missing).get_view_record(
+                    record_id=True
+                )
+                page_hashes = get_record_hashes(
+                    [record["record_id"] for record in records],
+                    [record["record_content"] for record in records],
+                )
+                new = {
+                    record["uuid"]: bytes(record_hash).hex()
+                    for record, record_hash in zip(records, page_hashes)
+                }
+            return new, {**known, **new}
+
+        executor = ThreadPoolExecutor(max_workers=MAX_SEARCH_PARALLELISM)
+        try:
+            futures = deque()
+
+            def collect():
+                new, page_hashes = futures.popleft().result()
+                if state is not None:
+                    state.record(new)
+                digests = bytes.fromhex("".join(page_hashes.values()))
+                hashes.append(np.frombuffer(digests, dtype=hashes[0].dtype))
+
+            for page in self.iter_search(page_size=SEARCH_PAGE_SIZE, limit=n):
+                if len(futures) == MAX_SEARCH_PARALLELISM:
+                    collect()
+                futures.append(executor.submit(hash_page, page))
+            while futures:
+                collect()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return np.concatenate(hashes)
+
+    def export(
+        self,
+        since=None,
+        state=None,
+        label_condition=None,
+        annotator_list=None,
+        record_metadata_condition=None,
+        verification_condition=None,
+        columns=None,
+    ):
         """
         Exporting function.
+
+        Parameters
+        ----
+        since : str
+            Watermark returned by a previous `export(since=...)` call. If set,
+            only export the records whose annotations were created, changed or
+            deleted after that export, and return the next watermark along.
+            Use `""` for a first, full export that also returns a watermark.
+            Apply the delta to the previous export with `merge_export`.
+            Changes are detected by comparing per-record hashes of the
+            annotations (record and span labels, with the label metadata
+            returned by `Subset.get_view_annotation`) with those kept in
+            the export state. The backend has no filter on modification
+            time, so the annotation view of all records is still read on
+            every call (from a fresh replica instead, see `replicate`);
+            only record contents are limited to changed records.
+            The watermark is a short token pointing at a generation of the
+            export state, and is only valid with that state. Records
+            removed from the project are not reported.
+        state : str
+            Location of the SQLite file of the export state, which keeps a
+            hash per labeled record. Defaults to a file under `~/.meganno`
+            keyed by host and project.
+        label_condition, annotator_list, record_metadata_condition, verification_condition :
+            Search predicates, see `search`. Only the matching records are
+            exported, and their rows are restricted to the labels named in
+            `label_condition` and `verification_condition` and to the
+            annotators of `annotator_list`; with a `verification_condition`
+            in "VERIFIED" (or "UNVERIFIED") mode, to the labels that were
+            (or were not) verified. Records are searched on the backend,
+            and only their views are downloaded; rows are then filtered by
+            the client.
+        columns : list
+            Subset of `'data_id', 'content', 'annotator', 'label_name',
+            'label_value'` to export. Record contents are not downloaded
+            if `'content'` is left out.
+
         Returns
         ----
         export_df : DataFrame
             A pandas dataframe with columns
             `'data_id', 'content', 'annotator',
-            'label_name', 'label_value'` for all records in the project
-
+            'label_name', 'label_value'` (or `columns`) for all records in
+            the project (or the records matching the predicates)
+        (delta_df, watermark) : tuple
+            If `since` is set: a dataframe with the same columns plus
+            `change`, and the watermark to pass to the next call.
+            Changed records have all their current rows, with `change` set
+            to "upsert"; changed records left without labels have a single
+            row with `change` set to "delete".
         """
+        conditions = dict(
+            label_condition=label_condition,
+            annotator_list=annotator_list,
+            record_metadata_condition=record_metadata_condition,
+            verification_condition=verification_condition,
+        )
+        filtered = any(value is not None for value in conditions.values())
+        if since is not None:
+            if filtered:
+                raise Exception("since can not be combined with search predicates.")
+            return self.__export_delta(since, columns=columns, state=state)
+        if filtered or columns is not None:
+            columns = get_export_columns(columns)
+            chunks = list(self.iter_export(columns=columns, **conditions))
+            if len(chunks) == 0:
+                return pd.DataFrame(columns=columns)
+            return pd.concat(chunks, ignore_index=True)
         payload = self.get_base_payload()
         path = self.get_service_endpoint("export_data")
-        response = get_request(path, json=payload)
-        if response.status_code == 200:
-            return pd.DataFrame(
-                json.loads(response.text),
-                columns=[
-                    "data_id",
-                    "content",
-                    "annotator",
-                    "label_name",
-                    "label_value",
-                ],
+        return get_export_df(self.transport.get(path, json=payload))
+
+    def __export_delta(self, since, columns=None, state=None):
+        namespace = self.get_service_endpoint()
+        state = ExportState(namespace, state or get_state_path("exports", namespace))
+        generation = state.get_generation(since)
+        known = state.get_hashes()
+        # hashes are stored as signed 64-bit integers; records never labeled
+        # are not kept in the state
+        unlabeled = get_annotation_hash([]) - 2**63
+        n = self.get_statistics().get_label_progress()["total"]
+        hashes, changed = {}, []
+        for page in self.iter_search(page_size=EXPORT_PAGE_SIZE, limit=n):
+            for item in page.get_view_annotation():
+                annotation_hash = get_annotation_hash(item["annotation_list"]) - 2**63
+                known_hash, changed_in = known.get(item["uuid"], (unlabeled, -1))
+                if known_hash != annotation_hash:
+                    hashes[item["uuid"]] = annotation_hash
+                if generation < 0:
+                    if annotation_hash != unlabeled:
+                        changed.append(item)
+                elif known_hash != annotation_hash or changed_in > generation:
+                    changed.append(item)
+        chunks, user_names = [], {}
+        for start in range(0, len(changed), EXPORT_PAGE_SIZE):
+            items = changed[start : start + EXPORT_PAGE_SIZE]
+            page = Subset(service=self, data_uuids=[item["uuid"] for item in items])
+            chunks.append(
+                self.__get_export_rows(
+                    page,
+                    annotation_items=items,
+                    keep_unlabeled=True,
+                    user_names=user_names,
+                )
+            )
+        delta = (
+            pd.concat(chunks, ignore_index=True)
+            if chunks
+            else pd.DataFrame(columns=EXPORT_COLUMNS)
+        )
+        change = np.where(delta["annotator"].isna(), "delete", "upsert")
+        delta = delta[get_export_columns(columns)].assign(change=change)
+        return delta, state.commit(hashes)
+
+    def iter_export(
+        self,
+        page_size=EXPORT_PAGE_SIZE,
+        label_condition=None,
+        annotator_list=None,
+        record_metadata_condition=None,
+        verification_condition=None,
+        columns=None,
+    ):
+        """
+        Stream the export of `export` as DataFrame chunks, one per page of
+        `page_size` records, fetching the next page while the current one
+        is consumed.
+
+        Parameters
+        ----------
+        page_size : int
+            Number of records per chunk.
+        label_condition, annotator_list, record_metadata_condition, verification_condition :
+            Search predicates, see `export`.
+        columns : list
+            Columns to export, see `export`.
+
+        Returns
+        -------
+        chunks : generator
+            Generator of DataFrames with the columns of `export`, one row
+            per record-level label.
+        """
+        columns = get_export_columns(columns)
+        label_names = [
+            condition.get("name", condition.get("label_name"))
+            for condition in [label_condition, verification_condition]
+            if condition is not None
+        ]
+        user_names = {}
+
+        def fetch(page):
+            return self.__get_export_rows(
+                page,
+                columns=columns,
+                annotator_list=annotator_list,
+                label_names=label_names or None,
+                verification_condition=verification_condition,
+                user_names=user_names,
+            )
+
+        n = self.get_statistics().get_label_progress()["total"]
+        pages = self.iter_search(
+            page_size=page_size,
+            limit=n,
+            label_condition=label_condition,
+            annotator_list=annotator_list,
+            record_metadata_condition=record_metadata_condition,
+            verification_condition=verification_condition,
+        )
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            page = next(pages, None)
+            future = None if page is None else executor.submit(fetch, page)
+            while future is not None:
+                chunk = future.result()
+                page = next(pages, None)
+                future = None if page is None else executor.submit(fetch, page)
+                yield chunk
+        finally:
+            pages.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __get_export_rows(
+        self,
+        page,
+        annotation_items=None,
+        keep_unlabeled=False,
+        columns=EXPORT_COLUMNS,
+        annotator_list=None,
+        label_names=None,
+        verification_condition=None,
+        user_names=None,
+    ):
+        """
+        Build the export rows of the records of `page`, with the same
+        columns as the backend export: annotators are named by their user
+        names (see `get_users_by_uids`).
+
+        Parameters
+        ----------
+        page : Subset
+            Records to export.
+        annotation_items : list
+            Annotations of the records, as returned by `get_view_annotation`.
+            Fetched if None.
+        keep_unlabeled : bool
+            If True, add a row with empty label fields for records without
+            record-level labels.
+        columns : list
+            Columns to return. Records are only fetched for `data_id` and
+            `content`.
+        annotator_list : list
+            Annotators to fetch the annotations of, all if None.
+        label_names : list
+            Labels to fetch, all if None.
+        verification_condition : dict
+            With `search_mode` "VERIFIED" (or "UNVERIFIED"), only keep the
+            labels of `label_name` confirmed or corrected by a verifier (or
+            not), checked per annotator with `Subset.get_view_verification`.
+        user_names : dict
+            User id -> name of the annotators already resolved, extended in
+            place.
+        """
+        records = {}
+        if "data_id" in columns or "content" in columns:
+            records = {
+                record["uuid"]: record
+                for record in page.get_view_record(
+                    record_id="data_id" in columns,
+                    record_content="content" in columns,
+                )
+            }
+        if annotation_items is None:
+            annotation_items = page.get_view_annotation(
+                annotator_list=annotator_list, label_names=label_names
             )
+        verified = None
+        mode = (verification_condition or {}).get("search_mode", "ALL")
+        if mode in ["VERIFIED", "UNVERIFIED"]:
+            verified_name = verification_condition["label_name"]
+            verified = set()
+            annotators = {
+                annotation["annotator"]
+                for item in annotation_items
+                for annotation in item["annotation_list"]
+            }
+            for annotator in annotators:
+                for item in page.get_view_verification(
+                    label_name=verified_name, label_level="record", annotator=annotator
+                ):
+                    if any(
+                        verification.get("verified_status") in VERIFIED_STATUSES
+                        for verification in item.get("verification_list", [])
+                    ):
+                        verified.add((item["uuid"], annotator))
+        user_names = {} if user_names is None else user_names
+        uids = {
+            annotation["annotator"]
+            for item in annotation_items
+            for annotation in item["annotation_list"]
+        }
+        uids = [uid for uid in uids if uid not in user_names]
+        if len(uids) > 0:
+            user_names.update({uid: uid for uid in uids})
+            user_names.update(self.get_users_by_uids(uids))
+        rows = []
+        for item in annotation_items:
+            record = records.get(item["uuid"], {})
+            count = len(rows)
+            for annotation in item["annotation_list"]:
+                annotator = annotation["annotator"]
+                for label in annotation.get("labels_record", []):
+                    if (
+                        verified is not None
+                        and label["label_name"] == verified_name
+                        and ((item["uuid"], annotator) in verified)
+                        != (mode == "VERIFIED")
+                    ):
+                        continue
+                    rows.append(
+                        [
+                            record.get("record_id"),
+                            record.get("record_content"),
+                            user_names[annotator],
+                            label["label_name"],
+                            label["label_value"],
+                        ]
+                    )
+            if keep_unlabeled and len(rows) == count:
+                rows.append(
+                    [record.get("record_id"), record.get("record_content")] + [None] * 3
+                )
+        return pd.DataFrame(rows, columns=EXPORT_COLUMNS)[columns]
+
+    def export_to(
+        self,
+        path,
+        format="parquet",
+        chunk_size=EXPORT_PAGE_SIZE,
+        label_condition=None,
+        annotator_list=None,
+        record_metadata_condition=None,
+        verification_condition=None,
+        columns=None,
+    ):
+        """
+        Export the project to a file without holding it in memory: records
+        are fetched `chunk_size` at a time (see `iter_export`) and each chunk
+        is appended to the file as soon as it arrives.
+
+        Parameters
+        ----------
+        path : str
+            Location of the output file.
+        format : str
+            'parquet' (one row group per chunk), 'feather' (Arrow IPC file,
+            one record batch per chunk) or 'csv'. `annotator` and
+            `label_name` are dictionary-encoded (categorical) in Parquet and
+            Feather files, which require `pyarrow`
+            (`pip install meganno_client[parquet]`).
+        chunk_size : int
+            Number of records fetched and written at a time.
+        label_condition, annotator_list, record_metadata_condition, verification_condition :
+            Search predicates, see `export`.
+        columns : list
+            Columns to write, see `export`.
+
+        Returns
+        -------
+        rows : int
+            Number of rows written.
+        """
+        format = format.lower()
+        if format not in ["parquet", "feather", "csv"]:
+            raise Exception("format must be one of 'parquet', 'feather' or 'csv'.")
+        columns = get_export_columns(columns)
+        chunks = self.iter_export(
+            page_size=chunk_size,
+            label_condition=label_condition,
+            annotator_list=annotator_list,
+            record_metadata_condition=record_metadata_condition,
+            verification_condition=verification_condition,
+            columns=columns,
+        )
+        rows = 0
+        if format == "csv":
+            pd.DataFrame(columns=columns).to_csv(path, index=False)
+            for chunk in chunks:
+                normalize_export(chunk).to_csv(
+                    path, mode="a", header=False, index=False
+                )
+                rows += len(chunk)
+            return rows
+        schema = get_export_schema(columns)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # categories only grow, so that each chunk's dictionary extends the
+        # previous one, as Arrow IPC files require
+        categories = {}
+        if format == "parquet":
+            writer = pq.ParquetWriter(path, schema)
         else:
-            raise Exception(response.text)
+            writer = pa.ipc.new_file(
+                path,
+                schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+            )
+        with writer:
+            for chunk in chunks:
+                writer.write_table(get_export_table(chunk, schema, categories))
+                rows += len(chunk)
+        return rows
 
     def set_verification_data(self, verify_list=[]):
-        result = []
+        """
+        Set verification labels, one request per item sent concurrently
+        (see `post_item_list`).
+
+        Parameters
+        ----------
+        verify_list : list
+            Items with keys `uuid`, `annotator_id` and `labels`.
+
+        Returns
+        -------
+        results : list
+            Response of each item, or `{"uuid": ..., "error": ...}` for items
+            that failed, in `verify_list` order.
+        """
+        item_list = []
         for each in verify_list:
             uuid = each["uuid"]
-            annotator_id = each["annotator_id"]
-            label_level = each["labels"][0]["label_level"]
-            label_name = each["labels"][0]["label_name"]
             payload = self.get_base_payload()
             payload.update(
                 {
                     "uuid": uuid,
                     "labels": each["labels"],
-                    "label_level": label_level,
-                    "label_name": label_name,
-                    "annotator_id": annotator_id,
+                    "label_level": each["labels"][0]["label_level"],
+                    "label_name": each["labels"][0]["label_name"],
+                    "annotator_id": each["annotator_id"],
                 }
             )
             path = self.get_service_endpoint("set_verification_data").format(uuid=uuid)
-            response = post_request(path, json=payload)
-            if response.status_code == 200:
-                result.append(response.json())
-            else:
-                result.append({"uuid": uuid, "error": response.text})
-        return result
+            item_list.append((uuid, path, payload))
+        return self.__post_items(item_list)
 
     def set_reconciliation_data(self, recon_list=[]):
-        result = []
+        """
+        Set reconciliation labels, one request per item sent concurrently
+        (see `post_item_list`).
+
+        Parameters
+        ----------
+        recon_list : list
+            Items with keys `uuid` and `labels`.
+
+        Returns
+        -------
+        results : list
+            Response of each item, or `{"uuid": ..., "error": ...}` for items
+            that failed, in `recon_list` order.
+        """
+        item_list = []
         for each in recon_list:
             uuid = each["uuid"]
             payload = self.get_base_payload()
@@ -612,12 +1616,30 @@ class Service:
             path = self.get_service_endpoint("set_reconciliation_data").format(
                 uuid=uuid
             )
-            response = post_request(path, json=payload)
-            if response.status_code == 200:
-                result.append(response.json())
-            else:
-                result.append({"uuid": uuid, "error": response.text})
-        return result
+            item_list.append((uuid, path, payload))
+        return self.__post_items(item_list)
+
+    def __post_items(self, item_list):
+        if self.__replica is not None:
+            self.__replica.mark_stale([uuid for uuid, _, _ in item_list])
+        controller = AdaptiveConcurrency(batch_size=1, max_batch_size=1)
+        return self.__run_pipeline(
+            lambda transport: post_item_list(transport, item_list, controller)
+        )
+
+    def __run_pipeline(self, pipeline):
+        """
+        Run the coroutine `pipeline(transport)` to completion with a fresh
+        `AsyncTransport`, sized for the concurrent upload pipelines.
+        """
+
+        async def main():
+            async with AsyncTransport(
+                max_connections=SUBMIT_MAX_CONCURRENCY
+            ) as transport:
+                return await pipeline(transport)
+
+        return asyncio.run(main())
 
     def __batch_update_metadata(self, meta_name, metadata_list):
         """
@@ -638,16 +1660,30 @@ class Service:
             }
         )
         path = self.get_service_endpoint("batch_update_metadata")
-        response = post_request(path, json=payload)
+        response = self.transport.post(path, json=payload)
         if response.status_code == 200:
             return response.text
         else:
             raise Exception(response.text)
 
-    def set_metadata(self, meta_name, func, batch_size=500):
+    def set_metadata(
+        self,
+        meta_name,
+        func,
+        batch_size=500,
+        batched=False,
+        processes=None,
+        checkpoint=None,
+        incremental=False,
+        vector_encoding=None,
+    ):
         """
         Set metadata for all records in the back-end database,
         based on user-defined function for metadata calculation.
+        Batches go through three overlapping stages: while the values of one
+        batch are computed, the records of the next batch are fetched and the
+        values of the previous batch are uploaded.
+
         Parameters
         ------
         meta_name : str
@@ -655,8 +1691,33 @@ class Service:
         func : function(raw_content)
             Function which takes input the raw data content and returns the
             corresponding metadata (int, string, vectors...).
+            With `batched=True`, takes the list of raw contents of a batch and
+            returns the list (or 2-d array) of their metadata, e.g. a
+            vectorized embedding model.
         batch_size : int
             Batch size for back-end database updates.
+        batched : bool
+            If True, call `func` once per batch instead of once per record.
+        processes : int
+            If set, compute values in a pool of this many worker processes,
+            for CPU-bound functions. `func` must then be picklable
+            (a module-level function, not a lambda).
+        checkpoint : str
+            Path of a local state file recording the records whose value was
+            uploaded, with a hash of their content. Records already in the
+            file with unchanged content are skipped, so an interrupted run
+            resumes where it stopped when called again with the same file.
+        incremental : bool
+            If True, only process records that do not have `meta_name` yet,
+            plus, with `checkpoint`, records whose content changed since
+            their value was computed.
+        vector_encoding : str
+            "float32" or "float16" to upload vector values (lists or NumPy
+            arrays) as base64-packed little-endian buffers instead of JSON
+            number lists (see `codec.encode_vector`). `Subset.get_view_record`
+            decodes them back. The backend stores them as opaque values, so
+            keep the default (plain lists) for metadata used by
+            `suggest_similar`.
 
         Example
         ----
@@ -664,24 +1725,124 @@ class Service:
         --8<-- "docs/assets/code/set_metadata.py"
         ```
         """
+        if vector_encoding is not None and vector_encoding not in VECTOR_DTYPES:
+            raise Exception(f"vector_encoding must be one of {list(VECTOR_DTYPES)}.")
+        if self.__replica is not None:
+            self.__replica.discard_metadata(meta_name)
         n = self.get_statistics().get_label_progress()["total"]
         set_count = 0
+        state = (
+            None if checkpoint is None else MetadataCheckpoint(checkpoint, meta_name)
+        )
+        if incremental:
+            uuid_list = self.__get_metadata_todo(meta_name, n, state)
+            pages = (
+                Subset(service=self, data_uuids=uuid_list[i : i + batch_size])
+                for i in range(0, len(uuid_list), batch_size)
+            )
+            n = len(uuid_list)
+        else:
+            pages = self.iter_search(page_size=batch_size, limit=n)
         batch_number = math.ceil(float(n) / batch_size)
+        pool = None if processes is None else ProcessPoolExecutor(processes)
 
-        with tqdm(
-            total=batch_number, leave=True, desc="Metadata batches processed:"
-        ) as tq:
-            for i in range(batch_number):
-                s = self.search(limit=batch_size, skip=i * batch_size)
-                data_batch = s.get_view_record()
-                for item in data_batch:
-                    item["value"] = func(item["record_content"])
-
-                res = self.__batch_update_metadata(meta_name, data_batch)
-                set_count += int(res)
-                tq.update()
+        def compute(data_batch):
+            contents = [item["record_content"] for item in data_batch]
+            if batched:
+                if pool is None:
+                    values = func(contents)
+                else:
+                    values = pool.submit(func, contents).result()
+                if isinstance(values, np.ndarray):
+                    values = list(values)
+                if len(values) != len(contents):
+                    raise Exception(
+                        f"Batched function returned {len(values)} values for {len(contents)} records."
+                    )
+            elif pool is None:
+                values = [func(content) for content in contents]
+            else:
+                chunksize = max(1, len(contents) // (4 * processes))
+                values = list(pool.map(func, contents, chunksize=chunksize))
+            return [
+                {"uuid": item["uuid"], "value": encode_value(value, vector_encoding)}
+                for item, value in zip(data_batch, values)
+            ]
+
+        def upload_batch(metadata_list, hashes):
+            if len(metadata_list) == 0:
+                return 0
+            res = self.__batch_update_metadata(meta_name, metadata_list)
+            if state is not None:
+                state.record(hashes)
+            return int(res)
+
+        fetcher = ThreadPoolExecutor(max_workers=1)
+        uploader = ThreadPoolExecutor(max_workers=1)
+        try:
+            with tqdm(
+                total=batch_number, leave=True, desc="Metadata batches processed:"
+            ) as tq:
+                page = next(pages, None)
+                records = None if page is None else fetcher.submit(page.get_view_record)
+                upload = None
+                while records is not None:
+                    data_batch = records.result()
+                    page = next(pages, None)
+                    records = (
+                        None if page is None else fetcher.submit(page.get_view_record)
+                    )
+                    hashes = {}
+                    if state is not None:
+                        hashes = {
+                            item["uuid"]: state.content_hash(item["record_content"])
+                            for item in data_batch
+                        }
+                        data_batch = [
+                            item
+                            for item in data_batch
+                            if not state.is_done(item["uuid"], hashes[item["uuid"]])
+                        ]
+                        hashes = {
+                            item["uuid"]: hashes[item["uuid"]] for item in data_batch
+                        }
+                    metadata_list = compute(data_batch) if len(data_batch) > 0 else []
+                    if upload is not None:
+                        set_count += upload.result()
+                        tq.update()
+                    upload = uploader.submit(upload_batch, metadata_list, hashes)
+                if upload is not None:
+                    set_count += upload.result()
+                    tq.update()
+        finally:
+            pages.close()
+            fetcher.shutdown(wait=False, cancel_futures=True)
+            uploader.shutdown(wait=True)
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
         return f"Set metadata '{meta_name}' for {set_count} data record{'s' if set_count > 1 else ''}."
 
+    def __get_metadata_todo(self, meta_name, n, state):
+        """
+        Get uuids of the records `set_metadata(incremental=True)` has to visit:
+        records without `meta_name`, and records with it that are tracked by
+        the checkpoint `state` (their content hash is checked once fetched).
+        """
+        every = UUIDArray(list(self.iter_search(limit=n, by_record=True)))
+        done = UUIDArray(
+            list(
+                self.iter_search(
+                    limit=n,
+                    by_record=True,
+                    record_metadata_condition={"name": meta_name, "operator": "exists"},
+                )
+            )
+        )
+        todo = every.difference(done)
+        if state is not None:
+            todo = todo.union(done.intersection(UUIDArray(state.get_uuid_list())))
+        return todo.tolist()
+
     def get_assignment(self, annotator=None, latest_only=False):
         """
         Get workload assignment for annotator.
@@ -697,13 +1858,5 @@ class Service:
         payload["annotator"] = annotator
         payload["latest_only"] = latest_only
         path = self.get_service_endpoint("get_assignment")
-        response = get_request(path, json=payload)
-
-        unique_assignments = set({})
-        if response.status_code == 200:
-            for res in response.json():
-                unique_assignments.update(res["uuid_list"])
-            return Subset(data_uuids=list(unique_assignments), service=self)
-
-        else:
-            raise Exception(response.text)
+        response = self.transport.get(path, json=payload)
+        return Subset(data_uuids=get_assignment_uuids(response), service=self)
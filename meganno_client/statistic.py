@@ -1,7 +1,6 @@
+import numpy as np
 import pydash
 
-from meganno_client.helpers import get_request
-
 
 class Statistic:
     """
@@ -29,7 +28,7 @@ class Statistic:
         """
         payload = self.__service.get_base_payload()
         path = self.__service.get_service_endpoint("get_label_progress")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -59,7 +58,7 @@ class Statistic:
         payload = self.__service.get_base_payload()
         payload.update({"label_name": label_name})
         path = self.__service.get_service_endpoint("get_label_distribution")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -76,7 +75,7 @@ class Statistic:
         """
         payload = self.__service.get_base_payload()
         path = self.__service.get_service_endpoint("get_annotator_contribution")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -105,13 +104,15 @@ class Statistic:
         payload = self.__service.get_base_payload()
         payload.update({"label_name": label_name})
         path = self.__service.get_service_endpoint("get_annotator_agreement")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
             raise Exception(response.text)
 
-    def get_embeddings(self, label_name: str = None, embed_type: str = None):
+    def get_embeddings(
+        self, label_name: str = None, embed_type: str = None, as_numpy=False
+    ):
         """Return 2-dimensional
         [TSNE](https://en.wikipedia.org/wiki/T-distributed_stochastic_neighbor_embedding)
         projection of the text embedding for data records,
@@ -124,6 +125,8 @@ class Statistic:
             Name of label as specified in the schema.
         embed_type : str
             the meta_name for the specified embedding
+        as_numpy : bool
+            If True, return `x_axis` and `y_axis` as float32 NumPy arrays.
 
 
         Returns
@@ -141,8 +144,12 @@ class Statistic:
         path = self.__service.get_service_endpoint("get_embeddings").format(
             embed_type=embed_type
         )
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
-            return response.json()
+            result = response.json()
+            if as_numpy:
+                for axis in ["x_axis", "y_axis"]:
+                    result[axis] = np.asarray(result[axis], dtype=np.float32)
+            return result
         else:
             raise Exception(response.text)
@@ -3,7 +3,15 @@ import time
 
 import pydash
 
-from meganno_client.helpers import get_request, post_request
+from meganno_client.annotation_store import AnnotationStore
+from meganno_client.codec import decode_value
+from meganno_client.helpers import (
+    check_annotation_input,
+    get_response_json,
+    get_uuid_payload,
+    merge_items,
+)
+from meganno_client.uuid_array import UUIDArray
 
 
 class Subset:
@@ -12,13 +20,18 @@ class Subset:
 
     Attributes
     ----------
-    __data_uuids : list
-        List of unique identifiers of data records in the subset.
+    __data_uuids : UUIDArray
+        Unique identifiers of data records in the subset, packed as 128-bit
+        values. Converted to a list of str only when sent to the backend.
     __service : Service
         Connected backend service
-    __my_annotation_list : list
+    __my_annotations : AnnotationStore
         Local cache of the record and annotation view of the subset owned by
-        service.annotator_id. with all possible metadata.
+        service.annotator_id. with all possible metadata, indexed by uuid
+        and annotator. Loaded on first use, or eagerly with `prefetch`.
+    __dirty_uuids : dict
+        Uuids of records whose own annotation was changed by `set_annotations`
+        since the last confirmed submission (keys of an insertion-ordered dict).
 
     """
 
@@ -31,22 +44,46 @@ class Subset:
         service : Service
             Service-class object identifying the connected
             backend service and corresponding data storage
-        data_uuids : list
+        data_uuids : list | UUIDArray
             List of data uuid's to be included in the subset
         """
-        self.__data_uuids = data_uuids
+        self.__data_uuids = UUIDArray(data_uuids)
         self.__service = service
         # TODO: to be removed after UI changes
         # in verifcation UI, instead of calling value() for subset owned
         # by job_id, on subset owned by user, call value(annotator_list =[job_id])
         self.job_id = job_id
-        if job_id is None:
-            self.annotator_id = service.get_annotator()["user_id"]
-        else:
-            self.annotator_id = job_id
-        self.__my_annotation_list = self.__get_annotation_list(
-            annotator_list=[self.annotator_id]
-        )
+        self.__annotator_id = job_id
+        self.__my_annotations = None
+        self.__dirty_uuids = {}
+
+    @property
+    def annotator_id(self):
+        """
+        User ID owning the cached annotations, resolved on first access.
+        """
+        if self.__annotator_id is None:
+            self.__annotator_id = self.__service.get_annotator()["user_id"]
+        return self.__annotator_id
+
+    def prefetch(self):
+        """
+        Eagerly load the annotation cache of the subset.
+        Otherwise it is fetched on first call to `value`,
+        `get_annotation_by_uuid` or `set_annotations`.
+
+        Returns
+        -------
+        subset : Subset
+            The subset itself, for chaining.
+        """
+        self.__get_my_annotations()
+        return self
+
+    def __get_my_annotations(self):
+        if self.__my_annotations is None:
+            self.__get_annotation_list(annotator_list=[self.annotator_id])
+        return self.__my_annotations
 
     def __get_annotator_id(self):
         if self.job_id is not None:
@@ -71,7 +108,7 @@ class Subset:
         payload = self.__service.get_base_payload()
         payload.update(
             {
-                "uuid_list": self.__data_uuids,
+                "uuid_list": self.get_uuid_list(),
                 "label_name": label_name,
                 "label_level": label_level,
                 "annotator": annotator,
@@ -80,7 +117,7 @@ class Subset:
             }
         )
         path = self.__service.get_service_endpoint("get_view_verification")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             return response.json()
         else:
@@ -95,7 +132,7 @@ class Subset:
         __data_uuids : list
             List of data uuids included in Subset
         """
-        return self.__data_uuids
+        return self.__data_uuids.tolist()
 
     def __get_annotation_list(self, annotator_list: list = None):
         """
@@ -133,17 +170,32 @@ class Subset:
             else False
         )
         payload.update(
-            {"uuid_list": self.__data_uuids, "annotator_list": annotator_list}
+            {"uuid_list": self.get_uuid_list(), "annotator_list": annotator_list}
         )
-        path = self.__service.get_service_endpoint("get_annotations")
-        response = get_request(path, json=payload)
-        if response.status_code == 200:
+        replica = self.__service.get_replica()
+        ret = (
+            None
+            if replica is None
+            else replica.get_annotation_list(self.get_uuid_list(), annotator_list)
+        )
+        if ret is None:
+            path = self.__service.get_service_endpoint("get_annotations")
+            response = self.__service.transport.get(path, json=payload)
+            if response.status_code != 200:
+                raise Exception(response.text)
             ret = response.json()
-            if update_cache:
-                self.__my_annotation_list = ret
-            return ret
-        else:
-            raise Exception(response.text)
+            record_cache = self.__service.get_record_cache()
+            if record_cache is not None:
+                record_cache.put_many(
+                    {
+                        item["uuid"]: {"record_content": item["data"]}
+                        for item in ret
+                        if "data" in item
+                    }
+                )
+        if update_cache:
+            self.__my_annotations = AnnotationStore(ret)
+        return ret
 
     def value(self, annotator_list: list = None):
         """
@@ -164,7 +216,7 @@ class Subset:
         # To retrieve own annotations. passin own id.
         # leave unchanged untile UI changes.
         if annotator_list is None:
-            return self.__my_annotation_list
+            return self.__get_my_annotations().value()
         else:
             return self.__get_annotation_list(annotator_list=annotator_list)
 
@@ -173,21 +225,70 @@ class Subset:
         record_id=None,
         record_content=None,
         record_meta_names=None,
+        as_numpy=False,
     ):
-        payload = self.__service.get_base_payload()
-        payload.update({"uuid_list": self.__data_uuids})
-        if record_id:
-            payload.update({"record_id": record_id})
-        if record_content:
-            payload.update({"record_content": record_content})
+        """Get the content and record-level metadata of the subset records.
+        Metadata vectors stored with `Service.set_metadata(vector_encoding=...)`
+        are decoded, as NumPy arrays if `as_numpy` is True or as lists otherwise.
+        Read from the replica of `Service.replicate` when it is fresh; record
+        ids and contents found in `Service.get_record_cache` are not
+        downloaded again.
+        """
+        uuid_list = self.get_uuid_list()
+        replica = self.__service.get_replica()
+        records = (
+            None
+            if replica is None
+            else replica.get_view_record(
+                uuid_list, record_id, record_content, record_meta_names
+            )
+        )
+        record_cache = self.__service.get_record_cache()
+        if records is None and record_cache is not None and record_content is not False:
+            fields = (
+                ["record_id", "record_content"] if record_id else ["record_content"]
+            )
+            cached = record_cache.get_many(uuid_list, fields)
+            missing = [uuid for uuid in uuid_list if uuid not in cached]
+            fetched = {}
+            if len(missing) > 0:
+                for record in self.__fetch_view_record(
+                    missing, record_id, record_content, record_meta_names
+                ):
+                    fetched[record["uuid"]] = record
+                record_cache.put_many(fetched)
+            if len(cached) > 0 and record_meta_names:
+                # metadata can change, only ids and contents are cached
+                for record in self.__fetch_view_record(
+                    list(cached), False, False, record_meta_names
+                ):
+                    merge_items(cached[record["uuid"]], record)
+            records = [
+                fetched[uuid] if uuid in fetched else {"uuid": uuid, **cached[uuid]}
+                for uuid in uuid_list
+                if uuid in fetched or uuid in cached
+            ]
+        if records is None:
+            records = self.__fetch_view_record(
+                uuid_list, record_id, record_content, record_meta_names
+            )
         if record_meta_names:
-            payload.update({"record_meta_names": record_meta_names})
+            # vectors stored with `set_metadata(vector_encoding=...)`
+            return decode_value(records, as_numpy=as_numpy)
+        return records
+
+    def __fetch_view_record(
+        self, uuid_list, record_id, record_content, record_meta_names
+    ):
+        payload = get_uuid_payload(
+            self.__service.get_base_payload(),
+            uuid_list,
+            record_id=record_id,
+            record_content=record_content,
+            record_meta_names=record_meta_names or None,
+        )
         path = self.__service.get_service_endpoint("get_view_record")
-        response = get_request(path, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.text)
+        return get_response_json(self.__service.transport.get(path, json=payload))
 
     def get_view_annotation(
         self,
@@ -195,20 +296,22 @@ class Subset:
         label_names=None,
         label_meta_names=None,
     ):
-        payload = self.__service.get_base_payload()
-        payload.update({"uuid_list": self.__data_uuids})
-        if annotator_list is not None:
-            payload.update({"annotator_list": annotator_list})
-        if label_names is not None:
-            payload.update({"label_names": label_names})
-        if label_meta_names is not None:
-            payload.update({"label_meta_names": label_meta_names})
+        replica = self.__service.get_replica()
+        if replica is not None and label_meta_names is None:
+            view = replica.get_view_annotation(
+                self.get_uuid_list(), annotator_list, label_names
+            )
+            if view is not None:
+                return view
+        payload = get_uuid_payload(
+            self.__service.get_base_payload(),
+            self.get_uuid_list(),
+            annotator_list=annotator_list,
+            label_names=label_names,
+            label_meta_names=label_meta_names,
+        )
         path = self.__service.get_service_endpoint("get_view_annotation")
-        response = get_request(path, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.text)
+        return get_response_json(self.__service.transport.get(path, json=payload))
 
     def get_view_verification(
         self,
@@ -219,25 +322,25 @@ class Subset:
         status_filter=None,
     ):
         # TODO: replace get_verification_annotations
-        payload = self.__service.get_base_payload()
-        payload.update({"uuid_list": self.__data_uuids})
-        if label_name is not None:
-            payload.update({"label_name": label_name})
-        if label_level is not None:
-            payload.update({"label_level": label_level})
-        if annotator is not None:
-            payload.update({"annotator": annotator})
-        if verifier_filter is not None:
-            payload.update({"verifier_filter": verifier_filter})
-        if status_filter is not None:
-            payload.update({"status_filter": status_filter})
-
+        replica = self.__service.get_replica()
+        filters = [annotator, verifier_filter, status_filter]
+        if replica is not None and all(value is None for value in filters):
+            view = replica.get_view_verification(
+                self.get_uuid_list(), label_name, label_level
+            )
+            if view is not None:
+                return view
+        payload = get_uuid_payload(
+            self.__service.get_base_payload(),
+            self.get_uuid_list(),
+            label_name=label_name,
+            label_level=label_level,
+            annotator=annotator,
+            verifier_filter=verifier_filter,
+            status_filter=status_filter,
+        )
         path = self.__service.get_service_endpoint("get_view_verification")
-        response = get_request(path, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.text)
+        return get_response_json(self.__service.transport.get(path, json=payload))
 
     def get_annotation_by_uuid(self, uuid):
         """
@@ -253,10 +356,7 @@ class Subset:
         annotation : dict
             Annotation for specified data record if it exists else None
         """
-        for annotation in self.__my_annotation_list:
-            if annotation["uuid"] == uuid:
-                return annotation
-        return None
+        return self.__get_my_annotations().get(uuid)
 
     def show(self, config={}):
         """
@@ -323,30 +423,73 @@ class Subset:
             Updated labels for uuid annotated by user
         """
         annotator_user_id = self.annotator_id
-        if pydash.is_empty(uuid):
-            raise Exception("UUID can not be None.")
-        elif pydash.is_empty(labels):
-            raise Exception(
-                f"Labels can not be None. For clearing annotations, use {{}}."
-            )
+        check_annotation_input(uuid, labels)
         labels["annotator"] = annotator_user_id
-        added = False
-        index = -1
-        for datapoint_idx, datapoint in enumerate(self.__my_annotation_list):
-            if datapoint["uuid"] == uuid:
-                index = datapoint_idx
-                for annotation_idx, annotation in enumerate(
-                    datapoint["annotation_list"]
-                ):
-                    if annotation["annotator"] == annotator_user_id:
-                        added = True
-                        self.__my_annotation_list[datapoint_idx]["annotation_list"][
-                            annotation_idx
-                        ] = labels
-        if not added and index != -1 and index < len(self.__my_annotation_list):
-            self.__my_annotation_list[index]["annotation_list"].append(labels)
+        # labels are not compared with the cached ones, which callers may
+        # have edited in place through `value`
+        if self.__get_my_annotations().set(uuid, annotator_user_id, labels):
+            self.__dirty_uuids[uuid] = True
         return labels
 
+    def set_annotations_many(self, annotations):
+        """Set the annotations of many data records at once.
+        Equivalent to calling `set_annotations` for each record.
+
+        Parameters
+        ----------
+        annotations : list | dict
+            List of `(uuid, labels)` pairs, or dictionary mapping uuid to labels.
+            See `set_annotations` for the structure of labels.
+
+        Returns
+        -------
+        labels_list : list
+            Updated labels for each record, in input order
+        """
+        if isinstance(annotations, dict):
+            annotations = annotations.items()
+        return [self.set_annotations(uuid, labels) for uuid, labels in annotations]
+
+    def get_dirty_uuids(self):
+        """
+        Get uuids of records whose annotations were changed with
+        `set_annotations` and not yet confirmed by the backend.
+
+        Returns
+        -------
+        uuid_list : list
+            Uuids of modified records, in modification order
+        """
+        return list(self.__dirty_uuids)
+
+    def mark_clean(self, uuid_list):
+        """
+        Mark records as in sync with the backend, e.g. after their
+        annotations were successfully submitted.
+
+        Parameters
+        ----------
+        uuid_list : list
+            Uuids of records to remove from the modified set
+        """
+        for uuid in uuid_list:
+            self.__dirty_uuids.pop(uuid, None)
+
+    def submit_changes(self):
+        """
+        Submit only the records modified since the last confirmed submission.
+        Records confirmed by the backend are removed from the modified set;
+        failed ones stay in it and are sent again on the next call.
+
+        Returns
+        -------
+        results : list
+            Per-record results of `Service.submit_annotations`
+        """
+        if len(self.__dirty_uuids) == 0:
+            return []
+        return self.__service.submit_annotations(self, self.get_dirty_uuids())
+
     def get_reconciliation_data(self, uuid_list=None):
         """Return the list of reconciliation data for all data entries specified by user.
         The reconciliation data for one data record consists of the annotations for it by all annotators
@@ -367,9 +510,33 @@ class Subset:
             ```
         """
         if uuid_list is None:
-            uuid_list = self.__data_uuids
+            uuid_list = self.get_uuid_list()
         return self.__service.get_reconciliation_data(uuid_list=uuid_list)
 
+    def iter_reconciliation_data(self, uuid_list=None, by_batch=False):
+        """Stream the reconciliation data of the subset records, fetching
+        batches concurrently. See `Service.iter_reconciliation_data`.
+
+        Parameters
+        ----------
+        uuid_list : list
+            list of uuid's provided by user.
+            If None, use all records in the subset
+        by_batch : bool
+            If True, yield lists of records, one per fetched batch.
+
+        Returns
+        -------
+        reconciliation_data : generator
+            Generator of reconciliation data, in the format of
+            `get_reconciliation_data`.
+        """
+        if uuid_list is None:
+            uuid_list = self.get_uuid_list()
+        return self.__service.iter_reconciliation_data(
+            uuid_list=uuid_list, by_batch=by_batch
+        )
+
     def suggest_similar(self, record_meta_name, limit=3):
         """For each data record in the subset, suggest more similar data records
             by retriving the most similar data records from the pool, based on
@@ -394,13 +561,13 @@ class Subset:
         payload = self.__service.get_base_payload()
         payload.update(
             {
-                "uuid_list": self.__data_uuids,
+                "uuid_list": self.get_uuid_list(),
                 "record_meta_name": record_meta_name,
                 "limit": limit,
             }
         )
         path = self.__service.get_service_endpoint("suggest_similar_annotations")
-        response = get_request(path, json=payload)
+        response = self.__service.transport.get(path, json=payload)
         if response.status_code == 200:
             suggested_uuids = list(set(json.loads(response.text)))
             return Subset(service=self.__service, data_uuids=suggested_uuids)
@@ -420,29 +587,48 @@ class Subset:
         payload = self.__service.get_base_payload()
         payload.update(
             {
-                "subset_uuid_list": self.__data_uuids,
+                "subset_uuid_list": self.get_uuid_list(),
                 "annotator": annotator,
             }
         )
         path = self.__service.get_service_endpoint("get_assignment")
+        return get_response_json(self.__service.transport.post(path, json=payload))
 
-        response = post_request(path, json=payload)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise Exception(response.text)
+    def __derive(self, data_uuids, operands):
+        """
+        Create a subset of `data_uuids` resulting from a set operation on
+        `operands`. If the operands already hold the annotation cache for
+        every resulting record, the new subset reuses copies of those entries
+        instead of fetching them again.
+        """
+        subset = Subset(service=self.__service, data_uuids=data_uuids)
+        # only caches owned by the service user match the derived subset
+        stores = [
+            operand.__my_annotations
+            for operand in operands
+            if operand.job_id is None and operand.__my_annotations is not None
+        ]
+        if len(stores) == 0:
+            return subset
+        store = stores[0]
+        for other in stores[1:]:
+            store = store.merge(other)
+        selected = store.select(data_uuids.tolist())
+        if selected is not None:
+            subset.__annotator_id = operands[0].__annotator_id
+            subset.__my_annotations = selected
+        return subset
 
     # overlading subset operation with set algebra
     def __or__(self, other):
         """
         Computation overloading for the set "or" operator |.
         With Subset A and B, C = A | B will return a new Subset object
-        with a uuid_list which unions data records in A and B.
+        with a uuid_list which unions data records in A and B,
+        records of A first, in their original order.
         """
-        return Subset(
-            service=self.__service,
-            data_uuids=list(set(self.get_uuid_list()) | set(other.get_uuid_list())),
-        )
+        data_uuids = self.__data_uuids.union(other.__data_uuids)
+        return self.__derive(data_uuids, [self, other])
 
     def union(self, other):
         return Subset.__or__(self, other)
@@ -451,21 +637,23 @@ class Subset:
         """
         Computation overloading for the set "and" operator &.
         With Subset A and B, C = A & B will return a new Subset object
-        with a uuid_list which intersects data records in A and B.
+        with a uuid_list which intersects data records in A and B,
+        in the order of A.
         """
-        return Subset(
-            service=self.__service,
-            data_uuids=list(set(self.get_uuid_list()) & set(other.get_uuid_list())),
-        )
+        data_uuids = self.__data_uuids.intersection(other.__data_uuids)
+        return self.__derive(data_uuids, [self, other])
 
     def intersection(self, other):
         return Subset.__and__(self, other)
 
     def __sub__(self, other):
-        return Subset(
-            service=self.__service,
-            data_uuids=list(set(self.get_uuid_list()) - set(other.get_uuid_list())),
-        )
+        """
+        Computation overloading for the set "difference" operator -.
+        With Subset A and B, C = A - B will return a new Subset object
+        with the data records of A that are not in B, in the order of A.
+        """
+        data_uuids = self.__data_uuids.difference(other.__data_uuids)
+        return self.__derive(data_uuids, [self, other])
 
     def difference(self, other):
         return Subset.__sub__(self, other)
@@ -0,0 +1,196 @@
+import numpy as np
+
+UUID_DTYPE = np.dtype("V16")
+HYPHEN_POSITIONS = [8, 13, 18, 23]
+DIGIT_POSITIONS = [i for i in range(36) if i not in HYPHEN_POSITIONS]
+
+
+class UUIDArray:
+    """
+    The UUIDArray class stores an ordered list of record uuids as packed
+    128-bit values in a NumPy array (16 bytes per uuid instead of a Python
+    str object). Set operations and membership checks search a 64-bit key
+    of each uuid (the XOR of its two halves) in a sorted index, and only
+    compare the full values of the candidates. Strings are only rebuilt at
+    the JSON boundary, by `tolist`, once per array.
+
+    Uuids that are not in canonical lowercase hyphenated form cannot be
+    packed without changing their text; such lists are kept as an object
+    array of str with the same interface.
+
+    Attributes
+    ----------
+    __values : numpy.ndarray
+        Uuids in subset order, of dtype `UUID_DTYPE` (or object if unpacked).
+    __index : tuple
+        Sorted keys and values in key order, built on first membership check.
+    __unique : bool
+        True if the uuids are known to be distinct, None if not checked.
+    __list : list
+        Uuid strings, built on first call to `tolist`.
+    """
+
+    def __init__(self, uuids=[], unique=None):
+        """
+        Init function
+
+        Parameters
+        ----------
+        uuids : list | UUIDArray | numpy.ndarray
+            Record uuids, in order.
+        unique : bool
+            True if the uuids are known to be distinct.
+        """
+        if isinstance(uuids, UUIDArray):
+            values = uuids.__values
+        elif isinstance(uuids, np.ndarray):
+            values = uuids
+        else:
+            values = UUIDArray.__pack(list(uuids))
+        self.__values = values
+        self.__index = None
+        self.__unique = unique
+        self.__list = None
+
+    @staticmethod
+    def __pack(uuids):
+        if any(not isinstance(value, str) or len(value) != 36 for value in uuids):
+            return np.array(uuids, dtype=object)
+        text = "".join(uuids).encode("ascii", errors="replace")
+        chars = np.frombuffer(text, dtype=np.uint8).reshape(-1, 36)
+        hyphens = chars[:, HYPHEN_POSITIONS]
+        digits = np.delete(chars, HYPHEN_POSITIONS, axis=1)
+        is_hex = ((digits >= ord("0")) & (digits <= ord("9"))) | (
+            (digits >= ord("a")) & (digits <= ord("f"))
+        )
+        if not (np.all(hyphens == ord("-")) and np.all(is_hex)):
+            return np.array(uuids, dtype=object)
+        return np.frombuffer(bytes.fromhex(digits.tobytes().decode()), dtype=UUID_DTYPE)
+
+    @staticmethod
+    def __unify(first, second):
+        # a packed and an unpacked array can only be compared as strings
+        if first.dtype == second.dtype:
+            return first, second
+        return (
+            np.array(UUIDArray(first).tolist(), dtype=object),
+            np.array(UUIDArray(second).tolist(), dtype=object),
+        )
+
+    @staticmethod
+    def __get_keys(values):
+        # sorting and searching uint64 is much faster than 16-byte voids
+        words = np.ascontiguousarray(values).view(np.uint64).reshape(-1, 2)
+        return words[:, 0] ^ words[:, 1]
+
+    def __len__(self):
+        return len(self.__values)
+
+    def tolist(self):
+        """
+        Convert back to a list of uuid strings, in subset order.
+        """
+        if self.__list is None:
+            if self.__values.dtype == UUID_DTYPE:
+                digits = np.frombuffer(
+                    self.__values.tobytes().hex().encode("ascii"), dtype=np.uint8
+                ).reshape(-1, 32)
+                chars = np.full((len(digits), 36), ord("-"), dtype=np.uint8)
+                chars[:, DIGIT_POSITIONS] = digits
+                text = chars.tobytes().decode("ascii")
+                self.__list = [text[i : i + 36] for i in range(0, len(text), 36)]
+            else:
+                self.__list = list(self.__values)
+        # callers may modify the returned list
+        return list(self.__list)
+
+    def __get_index(self):
+        if self.__index is None:
+            if self.__values.dtype == UUID_DTYPE:
+                keys = UUIDArray.__get_keys(self.__values)
+                order = np.argsort(keys, kind="stable")
+                keys = keys[order]
+                self.__index = (keys, self.__values[order])
+                if self.__unique is None and not np.any(keys[1:] == keys[:-1]):
+                    self.__unique = True
+            else:
+                self.__index = (None, np.sort(self.__values))
+        return self.__index
+
+    def isin(self, other):
+        """
+        Element-wise membership of the uuids of `other` in this array.
+
+        Parameters
+        ----------
+        other : UUIDArray
+
+        Returns
+        -------
+        mask : numpy.ndarray
+            Boolean array aligned with `other`.
+        """
+        needles = other.__values
+        if len(self.__values) == 0 or len(needles) == 0:
+            return np.zeros(len(needles), dtype=bool)
+        keys, haystack = self.__get_index()
+        if haystack.dtype != needles.dtype:
+            haystack, needles = UUIDArray.__unify(haystack, needles)
+            keys, haystack = None, np.sort(haystack)
+        if keys is None:
+            index = np.searchsorted(haystack, needles)
+            index[index == len(haystack)] = 0
+            return haystack[index] == needles
+        needle_keys = UUIDArray.__get_keys(needles)
+        left = np.minimum(np.searchsorted(keys, needle_keys), len(keys) - 1)
+        found = keys[left] == needle_keys
+        mask = np.zeros(len(needles), dtype=bool)
+        mask[found] = haystack[left[found]] == needles[found]
+        # keys shared by several uuids (repeated uuids or collisions)
+        shared = found & (keys[np.minimum(left + 1, len(keys) - 1)] == needle_keys)
+        shared[left == len(keys) - 1] = False
+        for i in np.flatnonzero(shared & ~mask):
+            right = np.searchsorted(keys, needle_keys[i], side="right")
+            mask[i] = np.any(haystack[left[i] : right] == needles[i])
+        return mask
+
+    def unique(self):
+        """
+        Drop repeated uuids, keeping the first occurrence of each.
+        """
+        if self.__unique is None and self.__values.dtype == UUID_DTYPE:
+            self.__get_index()
+        if self.__unique:
+            return self
+        _, index = np.unique(self.__values, return_index=True)
+        if len(index) == len(self.__values):
+            self.__unique = True
+            return self
+        return UUIDArray(self.__values[np.sort(index)], unique=True)
+
+    def union(self, other):
+        """
+        Uuids of this array followed by those of `other` not already present.
+        """
+        first, second = self.unique(), other.unique()
+        if first.__values.dtype != second.__values.dtype:
+            values, added = UUIDArray.__unify(first.__values, second.__values)
+            first, second = UUIDArray(values, unique=True), UUIDArray(
+                added, unique=True
+            )
+        added = second.__values[~first.isin(second)]
+        return UUIDArray(np.concatenate([first.__values, added]), unique=True)
+
+    def intersection(self, other):
+        """
+        Uuids of this array that are also in `other`, in the order of this array.
+        """
+        first = self.unique()
+        return UUIDArray(first.__values[other.isin(first)], unique=True)
+
+    def difference(self, other):
+        """
+        Uuids of this array that are not in `other`, in the order of this array.
+        """
+        first = self.unique()
+        return UUIDArray(first.__values[~other.isin(first)], unique=True)
@@ -27,7 +27,9 @@ package = {
         "jaro-winkler==2.0.3",
     ],
     "extras_require": {
-        "ui": ["meganno-ui @ git+https://github.com/megagonlabs/meganno-ui.git@v1.5.7"]
+        "ui": ["meganno-ui @ git+https://github.com/megagonlabs/meganno-ui.git@v1.5.7"],
+        "http2": ["httpx[http2]==0.24.1"],
+        "parquet": ["pyarrow"],
     },
     "include_package_data": True,
     "zip_safe": False,
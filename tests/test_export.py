@@ -0,0 +1,157 @@
+import httpx
+import pandas as pd
+import pytest
+
+from meganno_client import Service, merge_export
+from meganno_client.constants import EXPORT_COLUMNS
+from meganno_client.helpers import normalize_export
+
+PROJECT_URL = "http://backend:5000/demo"
+
+
+class FakeBackend:
+    """
+    In-memory stand-in for the REST endpoints used by exports, passed to
+    `Service` as its transport.
+    """
+
+    def __init__(self, n):
+        self.records = [
+            {"uuid": f"00000000-0000-4000-8000-{i:012d}", "id": i, "content": f"r{i}"}
+            for i in range(n)
+        ]
+        self.names = {"uid_a": "alice", "uid_b": "bob"}
+        # record uuid -> annotator uid -> record-level labels
+        self.labels = {}
+
+    def label(self, i, annotator, value):
+        uuid = self.records[i]["uuid"]
+        labels = [{"label_name": "sentiment", "label_value": value}]
+        self.labels.setdefault(uuid, {})[annotator] = labels
+
+    def unlabel(self, i):
+        self.labels.pop(self.records[i]["uuid"], None)
+
+    def get(self, path="", json={}, timeout=None, headers=None):
+        return httpx.Response(200, json=self.route(path.split("?")[0], json))
+
+    post = get
+
+    def close(self):
+        pass
+
+    def route(self, path, payload):
+        route = path[len(PROJECT_URL) :]
+        by_uuid = {record["uuid"]: record for record in self.records}
+        if route == "":
+            return {"version": "test"}
+        if route == "/statistics/label/progress":
+            return {"total": len(self.records), "annotated": len(self.labels)}
+        if route == "/data/search":
+            uuids = [record["uuid"] for record in self.records]
+            skip, limit = payload.get("skip") or 0, payload.get("limit")
+            return uuids[skip:] if limit is None else uuids[skip : skip + limit]
+        if route == "/auth/users/uids":
+            return {uid: self.names[uid] for uid in payload["uids"]}
+        if route == "/view/record":
+            return [
+                {
+                    "uuid": uuid,
+                    "record_id": by_uuid[uuid]["id"],
+                    "record_content": by_uuid[uuid]["content"],
+                }
+                for uuid in payload["uuid_list"]
+            ]
+        if route == "/view/annotation":
+            return [
+                {
+                    "uuid": uuid,
+                    "annotation_list": [
+                        {"annotator": uid, "labels_record": labels, "labels_span": []}
+                        for uid, labels in self.labels.get(uuid, {}).items()
+                    ],
+                }
+                for uuid in payload["uuid_list"]
+            ]
+        if route == "/data/export":
+            return [
+                [record["id"], record["content"], self.names[uid]]
+                + [label["label_name"], label["label_value"]]
+                for record in self.records
+                for uid, labels in self.labels.get(record["uuid"], {}).items()
+                for label in labels
+            ]
+        raise Exception(f"Unexpected request: {path}")
+
+
+def get_rows(df):
+    df = normalize_export(df)[[c for c in EXPORT_COLUMNS if c in df.columns]]
+    return sorted(
+        (row[:-1], tuple(row[-1])) for row in df.itertuples(index=False, name=None)
+    )
+
+
+@pytest.fixture
+def backend():
+    backend = FakeBackend(30)
+    for i in range(0, 30, 3):
+        backend.label(i, "uid_a", ["pos"])
+    backend.label(1, "uid_b", ["neg", "pos"])
+    return backend
+
+
+@pytest.mark.parametrize("extension", ["parquet", "feather", "csv"])
+def test_export_to_delta_merge_round_trip(backend, tmp_path, extension):
+    if extension != "csv":
+        pytest.importorskip("pyarrow")
+    service = Service(
+        host="http://backend", project="demo", token="t", transport=backend
+    )
+    path = str(tmp_path / f"export.{extension}")
+    state = str(tmp_path / "exports.sqlite")
+    service.export_to(path, format=extension)
+    _, first = service.export(since="", state=state)
+    assert len(first) < 40
+
+    backend.label(0, "uid_a", ["neg"])  # changed
+    backend.label(2, "uid_b", "pos")  # new, scalar label value
+    backend.unlabel(3)  # deleted
+    delta, watermark = service.export(since=first, state=state)
+    assert sorted(delta["change"]) == ["delete", "upsert", "upsert"]
+
+    merged = merge_export(path, delta)
+    expected = get_rows(service.export())
+    assert get_rows(merged) == expected
+    reread = merge_export(path, delta.iloc[:0])
+    assert get_rows(reread) == expected
+    if extension == "parquet":
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(path)
+        assert str(schema.field("annotator").type).startswith("dictionary")
+
+    delta, _ = service.export(since=watermark, state=state)
+    assert len(delta) == 0
+    # earlier watermarks of the same state stay valid
+    delta, _ = service.export(since=first, state=state)
+    assert sorted(delta["change"]) == ["delete", "upsert", "upsert"]
+    with pytest.raises(Exception, match="Unknown watermark"):
+        service.export(since=watermark, state=str(tmp_path / "other.sqlite"))
+
+
+def test_merge_export_mixed_label_values(tmp_path):
+    pytest.importorskip("pyarrow")
+    delta = pd.DataFrame(
+        {
+            "data_id": [1, "2"],
+            "annotator": ["alice", "bob"],
+            "label_name": ["sentiment", "sentiment"],
+            "label_value": [["pos", "neg"], "pos"],
+            "change": ["upsert", "upsert"],
+        }
+    )
+    path = str(tmp_path / "export.parquet")
+    merged = merge_export(path, delta)
+    assert merged["data_id"].tolist() == ["1", "2"]
+    assert merged["label_value"].tolist() == [["pos", "neg"], ["pos"]]
+    assert get_rows(pd.read_parquet(path)) == get_rows(merged)